@@ -21,7 +21,7 @@ from app.db.base import Base  # тут уже подтянутся все мод
 config = context.config
 
 # подсовываем Alembic наш URL из настроек
-config.set_main_option("sqlalchemy.url", settings.database_url.unicode_string())
+config.set_main_option("sqlalchemy.url", settings.sync_database_url)
 
 # Интерпретация конфигурационного файла для логгера.
 if config.config_file_name is not None:
@@ -46,7 +46,22 @@ def run_migrations_offline() -> None:
 
 
 def run_migrations_online() -> None:
-    """Запуск миграций в online-режиме."""
+    """
+    Запуск миграций в online-режиме.
+    Если соединение передали снаружи (app.db.migrate держит на нём
+    advisory-lock), мигрируем через него, иначе открываем своё.
+    """
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            compare_type=True,
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
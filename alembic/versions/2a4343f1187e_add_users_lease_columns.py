@@ -0,0 +1,51 @@
+"""add users lease columns
+
+Revision ID: 2a4343f1187e
+Revises: 70c05423c4e0
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.core.config import settings
+
+# revision identifiers, used by Alembic.
+revision: str = '2a4343f1187e'
+down_revision: Union[str, Sequence[str], None] = '70c05423c4e0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("users", sa.Column("expires_at", sa.DateTime(timezone=True), nullable=True))
+    op.add_column("users", sa.Column("lease_token", postgresql.UUID(as_uuid=True), nullable=True))
+
+    # уже стоящие lock'и получают аренду по старому правилу:
+    # locktime + lock_timeout_seconds — тот, с которым работает деплой
+    # (в k8s это 600 сек), а не значение по умолчанию: иначе lock'и,
+    # взятые незадолго до миграции, освободились бы посреди работы
+    if op.get_bind().dialect.name == "sqlite":
+        expires_at = "datetime(locktime, '+' || :timeout || ' seconds')"
+    else:
+        expires_at = "locktime + :timeout * interval '1 second'"
+    op.execute(
+        sa.text(f"UPDATE users SET expires_at = {expires_at} WHERE locktime IS NOT NULL")
+        .bindparams(timeout=settings.lock_timeout_seconds)
+    )
+
+    op.create_index(
+        "ix_users_expires_at",
+        "users",
+        ["expires_at"],
+        postgresql_where=sa.text("expires_at IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_users_expires_at", table_name="users")
+    op.drop_column("users", "lease_token")
+    op.drop_column("users", "expires_at")
@@ -0,0 +1,54 @@
+"""add users last_used_at
+
+Revision ID: 6c2adbd1ed74
+Revises: 2a4343f1187e
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '6c2adbd1ed74'
+down_revision: Union[str, Sequence[str], None] = '2a4343f1187e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    column = sa.Column(
+        "last_used_at",
+        sa.DateTime(timezone=True),
+        nullable=False,
+        server_default=sa.func.now(),
+    )
+    if op.get_bind().dialect.name == "sqlite":
+        # ALTER TABLE в SQLite не добавляет столбец с неконстантным DEFAULT —
+        # пересоздаём таблицу (UUID-колонки SQLite отражает как NUMERIC — задаём явно)
+        uuid_columns = [
+            sa.Column("id", sa.Uuid(), primary_key=True),
+            sa.Column("project_id", sa.Uuid(), nullable=False),
+            sa.Column("lease_token", sa.Uuid(), nullable=True),
+        ]
+        with op.batch_alter_table(
+            "users", recreate="always", reflect_args=uuid_columns
+        ) as batch_op:
+            batch_op.add_column(column)
+    else:
+        op.add_column("users", column)
+    # до этой миграции «последним использованием» считаем последний lock
+    op.execute("UPDATE users SET last_used_at = COALESCE(locktime, created_at)")
+
+    op.create_index(
+        "ix_users_lru_lookup",
+        "users",
+        ["project_id", "env", "domain", "last_used_at"],
+        postgresql_where=sa.text("locktime IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_users_lru_lookup", table_name="users")
+    op.drop_column("users", "last_used_at")
@@ -0,0 +1,32 @@
+"""add users listing indexes
+
+Revision ID: 70c05423c4e0
+Revises: 9f81b330e33d
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '70c05423c4e0'
+down_revision: Union[str, Sequence[str], None] = '9f81b330e33d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # keyset-пагинация GET /users: ORDER BY created_at DESC, id DESC
+    op.create_index("ix_users_created_at_id", "users", ["created_at", "id"])
+    op.create_index(
+        "ix_users_listing",
+        "users",
+        ["project_id", "env", "domain", "created_at", "id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_users_listing", table_name="users")
+    op.drop_index("ix_users_created_at_id", table_name="users")
@@ -0,0 +1,37 @@
+"""add users lookup indexes
+
+Revision ID: 9f81b330e33d
+Revises: 69cd2fed3740
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '9f81b330e33d'
+down_revision: Union[str, Sequence[str], None] = '69cd2fed3740'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # индексы, которые объявлены в модели, но не попали в первую миграцию
+    op.create_index("ix_users_project_id", "users", ["project_id"])
+    op.create_index("ix_users_locktime", "users", ["locktime"])
+
+    # поиск свободного пользователя под project_id/env/domain
+    op.create_index(
+        "ix_users_free_lookup",
+        "users",
+        ["project_id", "env", "domain", "created_at"],
+        postgresql_where=sa.text("locktime IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_users_free_lookup", table_name="users")
+    op.drop_index("ix_users_locktime", table_name="users")
+    op.drop_index("ix_users_project_id", table_name="users")
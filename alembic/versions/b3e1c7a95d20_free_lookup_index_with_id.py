@@ -0,0 +1,40 @@
+"""free lookup index with id
+
+Revision ID: b3e1c7a95d20
+Revises: 6c2adbd1ed74
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e1c7a95d20'
+down_revision: Union[str, Sequence[str], None] = '6c2adbd1ed74'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # strategy=oldest сортирует по (created_at, id): без id в индексе
+    # планировщик предпочитает ix_users_listing с Filter: locktime IS NULL
+    # и при занятой «голове» группы перебирает все её залоченные строки
+    op.drop_index("ix_users_free_lookup", table_name="users")
+    op.create_index(
+        "ix_users_free_lookup",
+        "users",
+        ["project_id", "env", "domain", "created_at", "id"],
+        postgresql_where=sa.text("locktime IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_users_free_lookup", table_name="users")
+    op.create_index(
+        "ix_users_free_lookup",
+        "users",
+        ["project_id", "env", "domain", "created_at"],
+        postgresql_where=sa.text("locktime IS NULL"),
+    )
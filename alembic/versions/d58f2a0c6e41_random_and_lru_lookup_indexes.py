@@ -0,0 +1,49 @@
+"""random and lru lookup indexes
+
+Revision ID: d58f2a0c6e41
+Revises: b3e1c7a95d20
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'd58f2a0c6e41'
+down_revision: Union[str, Sequence[str], None] = 'b3e1c7a95d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # strategy=random (по умолчанию): id >= pivot ORDER BY id внутри группы.
+    # Без него запрос идёт по users_pkey с фильтром и на полностью
+    # занятой группе просматривает всю таблицу
+    op.create_index(
+        "ix_users_random_lookup",
+        "users",
+        ["project_id", "env", "domain", "id"],
+        postgresql_where=sa.text("locktime IS NULL"),
+    )
+
+    # strategy=lru сортирует по (last_used_at, id)
+    op.drop_index("ix_users_lru_lookup", table_name="users")
+    op.create_index(
+        "ix_users_lru_lookup",
+        "users",
+        ["project_id", "env", "domain", "last_used_at", "id"],
+        postgresql_where=sa.text("locktime IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_users_lru_lookup", table_name="users")
+    op.create_index(
+        "ix_users_lru_lookup",
+        "users",
+        ["project_id", "env", "domain", "last_used_at"],
+        postgresql_where=sa.text("locktime IS NULL"),
+    )
+    op.drop_index("ix_users_random_lookup", table_name="users")
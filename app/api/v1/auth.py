@@ -4,10 +4,13 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
 from app.db.session import get_db
 from app.schemas.token import Token
+from app.schemas.user import UserRead
+from app.services import auth_cache
 from app.services.user_service import authenticate_user, get_user_by_id
-from app.core.security import create_access_token, decode_access_token
+from app.core.security import create_access_token
 
 router = APIRouter(tags=["auth"])
 
@@ -36,8 +39,12 @@ async def login_for_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # В subject кладём id пользователя (строкой)
-    access_token = create_access_token(subject=str(user.id))
+    # В subject кладём id пользователя (строкой),
+    # рядом — данные пользователя, чтобы get_current_user мог обойтись без БД
+    access_token = create_access_token(
+        subject=str(user.id),
+        claims=auth_cache.user_claims(user),
+    )
 
     return Token(access_token=access_token, token_type="bearer")
 
@@ -45,9 +52,15 @@ async def login_for_access_token(
 async def get_current_user(
     db: AsyncSession = Depends(get_db),
     token: str = Depends(oauth2_scheme),
-):
+) -> UserRead:
     """
     Зависимость для получения текущего пользователя по JWT-токену.
+
+    Горячий путь без БД: payload токена и снимок пользователя берём
+    из in-process кэша (см. app.services.auth_cache). В режиме
+    settings.auth_stateless пользователь собирается из claims токена.
+    Сессия БД открывается лениво — соединение из пула берётся только
+    при промахе кэша.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -56,7 +69,7 @@ async def get_current_user(
     )
 
     try:
-        payload = decode_access_token(token)
+        payload = auth_cache.decode_token_cached(token)
         sub: str | None = payload.get("sub")
         if sub is None:
             raise credentials_exception
@@ -69,8 +82,17 @@ async def get_current_user(
     except ValueError:
         raise credentials_exception
 
+    cached = auth_cache.user_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    if settings.auth_stateless:
+        user = auth_cache.user_from_claims(user_id, payload)
+        if user is not None:
+            return user
+
     user = await get_user_by_id(db, user_id=user_id)
     if user is None:
         raise credentials_exception
 
-    return user
+    return auth_cache.remember_user(user)
@@ -1,25 +1,26 @@
 from datetime import datetime, timezone
 
 from fastapi import APIRouter, HTTPException, status, Depends
-from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import get_db
+from app.db.session import get_db, get_pool_stats
+from app.services import warmup
+from app.services.health_checker import check_db, health_checker
 
 router = APIRouter(tags=["health"])
 
 
-async def _check_db(db: AsyncSession) -> dict:
+async def _db_status(db: AsyncSession) -> dict:
     """
-    Проверка доступности БД.
-    Делаем простой SELECT 1 через текущую async-сессию.
+    Статус БД для проб.
+    Обычно берём результат фоновой проверки (без checkout'а из пула);
+    если её ещё не было — проверяем сами через сессию (она ленивая,
+    соединение берётся только здесь).
     """
-    try:
-        await db.execute(text("SELECT 1"))
-        return {"status": "ok"}
-    except Exception as exc:
-        # В логах всё равно будет traceback от uvicorn
-        return {"status": "error", "error": str(exc)}
+    cached = health_checker.snapshot()
+    if cached is not None:
+        return cached
+    return await check_db(db)
 
 
 @router.get("/health", summary="Healthcheck сервиса")
@@ -31,7 +32,7 @@ async def healthcheck(
     - проверка работы приложения
     - проверка доступности БД
     """
-    db_status = await _check_db(db)
+    db_status = await _db_status(db)
     overall_ok = db_status["status"] == "ok"
 
     if not overall_ok:
@@ -63,7 +64,7 @@ async def readiness(db: AsyncSession = Depends(get_db)):
 
     Если БД недоступна → сервис считается неготовым принимать трафик.
     """
-    db_status = await _check_db(db)
+    db_status = await _db_status(db)
     if db_status["status"] != "ok":
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -74,3 +75,29 @@ async def readiness(db: AsyncSession = Depends(get_db)):
         "status": "ready",
         "db": db_status,
     }
+
+
+@router.get("/health/pool", summary="Состояние пула соединений БД")
+async def pool_status() -> dict:
+    """
+    Статистика пула: сколько соединений занято, overflow,
+    время ожидания checkout'а. Нужна для подбора размера пула
+    под число реплик и max_connections в Postgres.
+    """
+    return get_pool_stats()
+
+
+@router.get("/health/diagnostics", summary="Подробная диагностика")
+async def diagnostics() -> dict:
+    """
+    Всё сразу для разбора инцидентов: последний результат проверки БД,
+    пул соединений, прогрев на старте и состояние event loop'а.
+    Сам в БД не ходит.
+    """
+    return {
+        "time": datetime.now(timezone.utc).isoformat(),
+        "db": health_checker.snapshot(),
+        "warmup": warmup.last_warmup,
+        "pool": get_pool_stats(),
+        "loop": health_checker.loop_stats(),
+    }
@@ -1,23 +1,57 @@
-from typing import List
+import asyncio
+import json
+from typing import AsyncIterator, List, Optional
 from uuid import UUID
 
 from app.api.v1.auth import get_current_user
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Body, Depends, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
 from app.db.session import get_db
-from app.schemas.user import UserCreate, UserRead, UserLockResponse
+from app.schemas.user import (
+    FreeUserSelection,
+    UserBulkCreateResponse,
+    UserCreate,
+    UserFilter,
+    UserLease,
+    UserLockOutcome,
+    UserRead,
+    UserLockResponse,
+    UserPoolStats,
+    user_row_adapter,
+    user_rows_adapter,
+)
+from app.services.lock_events import user_events
 from app.services.user_service import (
     create_user,
+    create_users_bulk,
     get_users as get_users_service,
     acquire_lock as acquire_lock_service,
+    acquire_locks as acquire_locks_service,
     release_lock as release_lock_service,
+    release_locks as release_locks_service,
+    renew_lock as renew_lock_service,
     get_free_user as get_free_user_service,
+    get_pool_stats as get_pool_stats_service,
+    claim_free_user as claim_free_user_service,
+    claim_free_users as claim_free_users_service,
+    with_lease_state,
 )
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 
+def _json_response(body: bytes) -> Response:
+    """
+    Готовый JSON из TypeAdapter строк БД.
+    Response возвращаем сами — FastAPI не гоняет его повторно
+    через response_model и jsonable_encoder (схема в OpenAPI остаётся).
+    """
+    return Response(content=body, media_type="application/json")
+
+
 @router.post("/",
              response_model=UserRead,
              status_code=201)
@@ -29,50 +63,277 @@ async def create_user_endpoint(
     return await create_user(db=db, user_in=user_in)
 
 
+@router.post("/bulk",
+             response_model=UserBulkCreateResponse,
+             status_code=201)
+async def create_users_bulk_endpoint(
+    users_in: List[UserCreate],
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Массово создать пользователей (seed фермы).
+    Уже существующие логины пропускаются и попадают в skipped.
+    """
+    return await create_users_bulk(db=db, users_in=users_in)
+
+
 @router.get("/",
             response_model=List[UserRead])
 async def get_users_endpoint(
+    limit: int = Query(settings.users_page_default, ge=1, le=settings.users_page_max),
+    cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor"),
+    locked: Optional[bool] = Query(None, description="Только залоченные / только свободные"),
+    filters: UserFilter = Depends(),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Получить страницу пользователей (async).
+    Если есть следующая страница — её курсор приходит в заголовке X-Next-Cursor.
+    """
+    rows, next_cursor = await get_users_service(
+        db=db,
+        limit=limit,
+        cursor=cursor,
+        filters=filters,
+        locked=locked,
+    )
+    response = _json_response(user_rows_adapter.dump_json(rows))
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
+
+
+@router.get("/stats",
+            response_model=List[UserPoolStats])
+async def get_pool_stats_endpoint(
+    filters: UserFilter = Depends(),
     db: AsyncSession = Depends(get_db),
 ):
-    """Получить список всех пользователей (async)."""
-    return await get_users_service(db=db)
+    """
+    Сколько пользователей свободно/занято/с протухшей арендой
+    по группам project_id/env/domain (кэшируется на пару секунд).
+    """
+    return await get_pool_stats_service(db=db, filters=filters)
+
+
+async def _sse_user_events(filters: UserFilter) -> AsyncIterator[str]:
+    """
+    Поток событий в формате Server-Sent Events.
+    Пока событий нет — шлём комментарий-heartbeat, чтобы прокси не рвали соединение.
+    """
+    queue = user_events.subscribe(filters)
+    try:
+        yield ": connected\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(
+                    queue.get(), timeout=settings.events_heartbeat_seconds
+                )
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield f"event: {event['type']}\ndata: {json.dumps(event['users'])}\n\n"
+    finally:
+        user_events.unsubscribe(queue)
+
+
+@router.get("/events")
+async def user_events_endpoint(
+    filters: UserFilter = Depends(),
+):
+    """
+    SSE-поток событий по пользователям: locked, released, expired, created.
+    Можно сузить фильтрами project_id/env/domain.
+    Одно уведомление из БД раздаётся всем подписчикам реплики.
+    """
+    return StreamingResponse(
+        _sse_user_events(filters),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        },
+    )
 
 
 @router.get("/free",
             response_model=UserRead)
 async def get_free_user_endpoint(
+    wait: Optional[float] = Query(
+        None,
+        ge=0,
+        le=settings.free_user_wait_max_seconds,
+        description="Сколько секунд ждать освобождения, если свободных нет",
+    ),
+    filters: UserFilter = Depends(),
+    selection: FreeUserSelection = Depends(),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Получить любого свободного (не залоченного) пользователя.
+    С wait запрос ждёт освобождения пользователя вместо мгновенного 404.
+    """
+    row = await get_free_user_service(
+        db=db, filters=filters, selection=selection, wait=wait
+    )
+    return _json_response(user_row_adapter.dump_json(row))
+
+
+@router.post("/free/claim",
+             response_model=UserLease)
+async def claim_free_user_endpoint(
+    ttl: Optional[int] = Query(
+        None,
+        ge=1,
+        le=settings.lease_max_ttl_seconds,
+        description="Срок аренды, сек (по умолчанию lock_timeout_seconds)",
+    ),
+    wait: Optional[float] = Query(
+        None,
+        ge=0,
+        le=settings.free_user_wait_max_seconds,
+        description="Сколько секунд ждать освобождения, если свободных нет",
+    ),
+    filters: UserFilter = Depends(),
+    selection: FreeUserSelection = Depends(),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Найти и сразу залочить свободного пользователя одним запросом к БД.
+    Конкурентные клиенты никогда не получают одного и того же пользователя.
+    lease_token из ответа нужен для renew/release.
+    """
+    return await claim_free_user_service(
+        db=db, filters=filters, ttl=ttl, selection=selection, wait=wait
+    )
+
+
+@router.post("/claim",
+             response_model=List[UserLease])
+async def claim_free_users_endpoint(
+    count: int = Query(1, ge=1, le=settings.claim_batch_max),
+    ttl: Optional[int] = Query(
+        None,
+        ge=1,
+        le=settings.lease_max_ttl_seconds,
+        description="Срок аренды, сек (по умолчанию lock_timeout_seconds)",
+    ),
+    wait: Optional[float] = Query(
+        None,
+        ge=0,
+        le=settings.free_user_wait_max_seconds,
+        description="Сколько секунд ждать освобождения, если свободных нет",
+    ),
+    filters: UserFilter = Depends(),
+    selection: FreeUserSelection = Depends(),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Залочить до count свободных пользователей одним запросом к БД.
+    Если свободных меньше — возвращаем сколько есть (может быть пустой список).
+    """
+    return await claim_free_users_service(
+        db=db, count=count, filters=filters, ttl=ttl, selection=selection, wait=wait
+    )
+
+
+@router.post("/acquire",
+             response_model=List[UserLockOutcome])
+async def acquire_locks_endpoint(
+    user_ids: List[UUID] = Body(..., min_length=1, description="id пользователей"),
+    ttl: Optional[int] = Query(
+        None,
+        ge=1,
+        le=settings.lease_max_ttl_seconds,
+        description="Срок аренды, сек (по умолчанию lock_timeout_seconds)",
+    ),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Залочить пользователей по списку id одним запросом к БД.
+    Все занятые получают общий lease_token; по каждому id — свой статус.
+    """
+    return await acquire_locks_service(db=db, user_ids=user_ids, ttl=ttl)
+
+
+@router.post("/release",
+             response_model=List[UserLockOutcome])
+async def release_locks_endpoint(
+    user_ids: Optional[List[UUID]] = Body(None, description="id пользователей"),
+    lease_token: Optional[UUID] = Query(None, description="Снимать только аренды этого токена"),
+    force: bool = Query(False, description="Административный сброс: снять без lease_token"),
+    filters: UserFilter = Depends(),
     db: AsyncSession = Depends(get_db),
 ):
-    """Получить любого свободного (не залоченного) пользователя."""
-    return await get_free_user_service(db=db)
+    """
+    Снять блокировки по списку id и/или по project_id/env/domain одним запросом
+    (например, teardown тестового прогона).
+    Нужен lease_token держателя; чужие аренды — только с force=true.
+    """
+    return await release_locks_service(
+        db=db, user_ids=user_ids, filters=filters, lease_token=lease_token, force=force
+    )
 
 
 @router.post("/{user_id}/acquire",
              response_model=UserLockResponse)
 async def acquire_lock_endpoint(
     user_id: UUID,
+    ttl: Optional[int] = Query(
+        None,
+        ge=1,
+        le=settings.lease_max_ttl_seconds,
+        description="Срок аренды, сек (по умолчанию lock_timeout_seconds)",
+    ),
     db: AsyncSession = Depends(get_db),
 ):
     """Наложить блокировку на пользователя (async)."""
-    return await acquire_lock_service(db=db, user_id=user_id)
+    return await acquire_lock_service(db=db, user_id=user_id, ttl=ttl)
+
+
+@router.post("/{user_id}/renew",
+             response_model=UserLockResponse)
+async def renew_lock_endpoint(
+    user_id: UUID,
+    lease_token: UUID,
+    ttl: Optional[int] = Query(
+        None,
+        ge=1,
+        le=settings.lease_max_ttl_seconds,
+        description="Срок аренды, сек (по умолчанию lock_timeout_seconds)",
+    ),
+    db: AsyncSession = Depends(get_db),
+):
+    """Продлить аренду пользователя (heartbeat держателя lock'а)."""
+    return await renew_lock_service(db=db, user_id=user_id, lease_token=lease_token, ttl=ttl)
 
 
 @router.post("/{user_id}/release",
              response_model=UserLockResponse)
 async def release_lock_endpoint(
     user_id: UUID,
+    lease_token: Optional[UUID] = Query(None, description="Токен аренды из acquire/claim"),
+    force: bool = Query(False, description="Административный сброс: снять без lease_token"),
     db: AsyncSession = Depends(get_db),
 ):
-    """Снять блокировку с пользователя (async)."""
-    return await release_lock_service(db=db, user_id=user_id)
+    """
+    Снять блокировку с пользователя (async).
+    Нужен lease_token держателя; без него — только с force=true.
+    """
+    return await release_lock_service(
+        db=db, user_id=user_id, lease_token=lease_token, force=force
+    )
 
 
 @router.get("/me", response_model=UserRead)
 async def read_current_user(
     current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Получить текущего пользователя по токену.
     """
-    # current_user — это ORM-модель User, приведём к схеме UserRead
-    return UserRead.model_validate(current_user)
+    # current_user — снимок UserRead без аренды (из кэша, claims или БД);
+    # locktime/expires_at читаем у бэкенда аренд на каждый запрос
+    return await with_lease_state(db, current_user)
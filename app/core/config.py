@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 from pydantic import PostgresDsn
 
@@ -5,7 +7,73 @@ from pydantic import PostgresDsn
 class Settings(BaseSettings):
     database_url: PostgresDsn
     debug: bool = True
-    lock_timeout_seconds: int = 300 # 5 минут lock
+
+    # Пул соединений и драйвер (asyncpg).
+    # Итого на реплику: до db_pool_size + db_max_overflow соединений —
+    # умножаем на число реплик/воркеров и сверяем с max_connections в Postgres.
+    db_echo: bool = False  # логировать каждый SQL — только для отладки
+    db_pool_size: int = 10
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 10.0  # сколько ждать свободное соединение, сек
+    db_pool_recycle: int = 1800  # пересоздавать соединения старше, сек
+    db_pool_pre_ping: bool = True
+    db_statement_cache_size: int = 100  # кэш prepared statements asyncpg (0 для pgbouncer)
+    db_prepared_statement_cache_size: int = 100  # тот же кэш на стороне SQLAlchemy
+    db_command_timeout: float | None = None  # таймаут запроса в asyncpg, сек
+
+    lock_timeout_seconds: int = 300 # 5 минут lock — TTL аренды по умолчанию
+    lease_max_ttl_seconds: int = 3600
+    claim_batch_max: int = 500
+    bulk_lock_max: int = 1000  # id в одном POST /users/acquire|release
+    # где хранить аренды: postgres (колонки users) или redis (ключи с TTL)
+    lock_backend: Literal["postgres", "redis"] = "postgres"
+    redis_url: str = "redis://localhost:6379/0"
+    redis_lock_prefix: str = "botofarm"
+    redis_lock_scan_batch: int = 100  # кандидатов из БД за один проход
+    # как выбирать свободного пользователя: oldest, lru, random.
+    # random разводит конкурентных claimer'ов по разным строкам;
+    # oldest и lru отдают всем одну и ту же «голову» очереди
+    free_user_strategy: Literal["oldest", "lru", "random"] = "random"
+    users_page_default: int = 100
+    users_page_max: int = 1000
+    users_stats_cache_ttl_seconds: float = 2.0
+    bulk_create_max: int = 10000
+    bulk_insert_batch_size: int = 1000
+    # long-poll ожидания свободного пользователя (?wait=...)
+    free_user_wait_max_seconds: float = 60.0
+    free_user_wait_recheck_seconds: float = 5.0
+    # SSE-поток событий: очередь на подписчика и keep-alive
+    events_queue_size: int = 1000
+    events_heartbeat_seconds: float = 15.0
+    # пул для pbkdf2: thread (по умолчанию) или process; None → по доступным ядрам (квота cgroup)
+    password_hash_executor: Literal["thread", "process"] = "thread"
+    password_hash_workers: int | None = None
+    # кэш успешных проверок пароля для /token (0 — выключен)
+    credential_cache_size: int = 10000
+    credential_cache_ttl_seconds: float = 300.0
+    # кэш токенов/пользователей для get_current_user
+    auth_cache_size: int = 10000
+    auth_cache_ttl_seconds: float = 30.0
+    # True — доверять claims из токена и вообще не ходить в БД
+    auth_stateless: bool = False
+    # фоновая проверка БД для health-проб
+    health_check_interval_seconds: float = 5.0
+    health_check_timeout_seconds: float = 2.0
+    health_max_staleness_seconds: float = 30.0
+    # запуск через python -m app.server; web_workers=None — по ядрам/квоте CPU
+    web_host: str = "0.0.0.0"
+    web_port: int = 8000
+    web_workers: int | None = None
+    web_graceful_timeout_seconds: float = 30.0  # дождаться текущих запросов при SIGTERM
+    web_keepalive_seconds: int = 5
+    # при нескольких воркерах: как часто воркер обновляет снимок пула/кэшей для /metrics
+    metrics_refresh_interval_seconds: float = 5.0
+    # старт воркера: заранее открыть соединения и прогреть схемы до readiness
+    startup_warmup: bool = True
+    db_warmup_connections: int = 2
+    warmup_timeout_seconds: float = 10.0
+    lock_reaper_enabled: bool = True
+    lock_reaper_interval_seconds: float = 30.0
 
     @property
     def async_database_url(self) -> str:
@@ -15,6 +83,15 @@ class Settings(BaseSettings):
         url = self.database_url.unicode_string()
         return url.replace("postgresql+psycopg2", "postgresql+asyncpg")
 
+    @property
+    def sync_database_url(self) -> str:
+        """
+        Sync-URL (postgresql+psycopg2://....) для Alembic и app.db.migrate,
+        даже если в DATABASE_URL указан asyncpg.
+        """
+        url = self.database_url.unicode_string()
+        return url.replace("postgresql+asyncpg", "postgresql+psycopg2")
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
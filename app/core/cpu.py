@@ -0,0 +1,52 @@
+"""
+Сколько ядер реально доступно процессу. В контейнере os.cpu_count()
+возвращает ядра хоста, а не CPU-квоту пода (limits.cpu), поэтому
+размер пулов считаем по affinity и квоте cgroup.
+"""
+
+import math
+import os
+from pathlib import Path
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+
+
+def _read(path: Path) -> str | None:
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit(root: Path = CGROUP_ROOT) -> float | None:
+    """
+    CPU-квота контейнера в ядрах (limits.cpu в Kubernetes) или None,
+    если квоты нет. cgroup v2: cpu.max = "<quota> <period>" или "max <period>";
+    cgroup v1: cpu/cpu.cfs_quota_us (-1 — без квоты) и cpu/cpu.cfs_period_us.
+    """
+    cpu_max = _read(root / "cpu.max")
+    if cpu_max is not None:
+        quota, _, period = cpu_max.partition(" ")
+        if quota == "max" or not period:
+            return None
+        return int(quota) / int(period)
+
+    quota = _read(root / "cpu" / "cpu.cfs_quota_us")
+    period = _read(root / "cpu" / "cpu.cfs_period_us")
+    if quota is None or period is None or int(quota) <= 0:
+        return None
+    return int(quota) / int(period)
+
+
+def available_cpus(root: Path = CGROUP_ROOT) -> int:
+    """Сколько ядер реально доступно: affinity процесса, урезанная квотой cgroup."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        # нет sched_getaffinity (macOS)
+        cpus = os.cpu_count() or 1
+
+    limit = cgroup_cpu_limit(root)
+    if limit is not None:
+        cpus = min(cpus, math.ceil(limit))
+    return max(cpus, 1)
@@ -0,0 +1,298 @@
+"""
+Prometheus-метрики сервиса.
+
+prometheus_client хранит значения в памяти процесса, а python -m app.server
+поднимает несколько воркеров uvicorn. Поэтому при нескольких воркерах
+server.py включает multiprocess-режим (PROMETHEUS_MULTIPROC_DIR): каждый
+воркер пишет значения в mmap-файлы общего каталога, а /metrics собирает
+их MultiProcessCollector'ом — счётчики и гистограммы суммируются по всем
+воркерам пода, а не берутся у того, кто ответил на scrape.
+"""
+
+import asyncio
+import os
+import re
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+_LIVE_GAUGE_FILE = re.compile(r"^gauge_live\w+_(\d+)\.db$")
+
+# -----------------------------
+# HTTP
+# -----------------------------
+
+REQUEST_LATENCY = Histogram(
+    "botofarm_http_request_duration_seconds",
+    "Время обработки HTTP-запроса",
+    ["method", "route", "status"],
+)
+
+REQUESTS_IN_FLIGHT = Gauge(
+    "botofarm_http_requests_in_flight",
+    "Запросы, которые обрабатываются прямо сейчас",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+
+# -----------------------------
+# БД
+# -----------------------------
+
+DB_QUERY_LATENCY = Histogram(
+    "botofarm_db_query_duration_seconds",
+    "Время выполнения SQL-запроса",
+    ["operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+# пул и кэши — снимки состояния воркера, их обновляет publish_runtime_metrics();
+# live*-режимы: в сумму/максимум по поду попадают только живые воркеры
+
+DB_POOL_CONNECTIONS = Gauge(
+    "botofarm_db_pool_connections",
+    "Соединения пула БД по состоянию (сумма по воркерам)",
+    ["state"],
+    multiprocess_mode="livesum",
+)
+
+DB_POOL_SIZE = Gauge(
+    "botofarm_db_pool_size",
+    "Настроенный размер пула БД (сумма по воркерам)",
+    multiprocess_mode="livesum",
+)
+
+DB_POOL_WAIT_MAX = Gauge(
+    "botofarm_db_pool_checkout_wait_seconds_max",
+    "Максимальное ожидание соединения из пула",
+    multiprocess_mode="livemax",
+)
+
+AUTH_CACHE_EVENTS = Gauge(
+    "botofarm_auth_cache_events",
+    "Попадания/промахи кэшей авторизации (сумма по воркерам)",
+    ["cache", "result"],
+    multiprocess_mode="livesum",
+)
+
+# -----------------------------
+# Доменные счётчики
+# -----------------------------
+
+USERS_CLAIMED = Counter(
+    "botofarm_users_claimed_total",
+    "Пользователи, выданные через claim",
+)
+
+FREE_USERS_EXHAUSTED = Counter(
+    "botofarm_free_users_not_found_total",
+    "Ответы 404: свободных пользователей нет",
+)
+
+LOCK_CONFLICTS = Counter(
+    "botofarm_lock_conflicts_total",
+    "Ответы 409: пользователь уже залочен",
+)
+
+LOCKS_REAPED = Counter(
+    "botofarm_locks_reaped_total",
+    "Протухшие lock'и, снятые reaper'ом",
+)
+
+EVENT_STREAMS_OPEN = Gauge(
+    "botofarm_event_streams_open",
+    "Открытые потоки событий (SSE) — вне латентности и запросов в полёте",
+    multiprocess_mode="livesum",
+)
+
+
+def _route_template(scope) -> str:
+    """
+    Шаблон пути для label'а: /api/v1/users/{user_id}/acquire, а не сам путь —
+    иначе кардинальность взорвётся на id. Роутер кладёт совпавший роут
+    в scope, берём его path; запросы мимо роутов схлопываем в один label.
+
+    У роута из include_router FastAPI может хранить path без префикса
+    роутера: префикс — начало пути до хвоста, который матчит сам роут.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+
+    path = scope["path"]
+    start = 0
+    while start != -1:
+        if route.path_regex.match(path[start:]):
+            return path[:start] + template
+        start = path.find("/", start + 1)
+    return template
+
+
+class MetricsMiddleware:
+    """
+    Чистый ASGI-middleware (без BaseHTTPMiddleware — он заметно дороже):
+    гистограмма латентности по шаблону роута и gauge запросов в полёте.
+
+    Потоковые пути (stream_paths, например SSE) живут, пока клиент
+    подключён: в латентность и «запросы в полёте» их не пишем,
+    считаем отдельно числом открытых потоков.
+    """
+
+    def __init__(self, app, stream_paths: frozenset[str] = frozenset()) -> None:
+        self.app = app
+        self.stream_paths = stream_paths
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if scope["path"] in self.stream_paths:
+            with EVENT_STREAMS_OPEN.track_inprogress():
+                await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_flight = REQUESTS_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            REQUEST_LATENCY.labels(method, _route_template(scope), str(status_code)).observe(
+                time.perf_counter() - started
+            )
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Навесить на движок замер времени SQL-запросов."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement else "UNKNOWN"
+        DB_QUERY_LATENCY.labels(operation).observe(time.perf_counter() - started)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+
+
+def multiprocess_dir() -> str | None:
+    """Каталог multiprocess-режима или None, если метрики живут в памяти процесса."""
+    return os.environ.get(MULTIPROC_DIR_ENV)
+
+
+def publish_runtime_metrics() -> None:
+    """
+    Снять состояние пула соединений и кэшей авторизации этого воркера
+    в gauge'и. Считать на каждый запрос дороже, поэтому снимок обновляется
+    перед scrape'ом и фоновой задачей run_runtime_publisher — иначе
+    в multiprocess-режиме остальные воркеры отдавали бы значения со старта.
+    """
+    from app.db.session import get_pool_stats
+    from app.services.auth_cache import credential_cache, token_cache, user_cache
+
+    pool = get_pool_stats()
+    for state in ("checked_out", "checked_in", "overflow"):
+        DB_POOL_CONNECTIONS.labels(state).set(pool[state])
+    DB_POOL_SIZE.set(pool["size"])
+    DB_POOL_WAIT_MAX.set(pool.get("wait_seconds_max", 0.0))
+
+    for name, cache in (
+        ("credentials", credential_cache),
+        ("tokens", token_cache),
+        ("users", user_cache),
+    ):
+        AUTH_CACHE_EVENTS.labels(name, "hit").set(cache.hits)
+        AUTH_CACHE_EVENTS.labels(name, "miss").set(cache.misses)
+
+
+async def run_runtime_publisher(interval: float) -> None:
+    """Фоновая задача воркера в multiprocess-режиме: раз в interval обновлять снимок."""
+    while True:
+        publish_runtime_metrics()
+        await asyncio.sleep(interval)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def sweep_dead_workers(path: str | None = None) -> list[int]:
+    """
+    Убрать live-gauge'и воркеров, которых уже нет. Штатно выходящий воркер
+    чистит за собой сам (mark_worker_dead), а упавший — нет: его
+    «запросы в полёте» и пул висели бы в сумме до перезапуска пода.
+    Вызывается на старте каждого воркера — перезапущенный воркер
+    подчищает за упавшим.
+    """
+    path = path or multiprocess_dir()
+    if not path:
+        return []
+
+    dead = set()
+    for name in os.listdir(path):
+        match = _LIVE_GAUGE_FILE.match(name)
+        if match and not _pid_alive(int(match.group(1))):
+            dead.add(int(match.group(1)))
+
+    for pid in dead:
+        multiprocess.mark_process_dead(pid, path)
+    return sorted(dead)
+
+
+def mark_worker_dead() -> None:
+    """На остановке воркера: его live-gauge'и больше не участвуют в сумме."""
+    path = multiprocess_dir()
+    if path:
+        multiprocess.mark_process_dead(os.getpid(), path)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    Тело и content-type ответа /metrics. В multiprocess-режиме реестр
+    собирается на каждый scrape из файлов всех воркеров.
+    """
+    publish_runtime_metrics()
+    if multiprocess_dir() is None:
+        return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -1,7 +1,13 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
 from passlib.context import CryptContext
 from datetime import datetime, timedelta, timezone
 from jose import JWTError, jwt
 
+from app.core.config import settings
+from app.core.cpu import available_cpus
+
 # pwd_context = CryptContext(
 #     schemes=["bcrypt"],
 #     deprecated="auto",
@@ -23,6 +29,53 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+# -----------------------------
+# Хеширование вне event loop
+# -----------------------------
+
+# pbkdf2 — это десятки миллисекунд CPU на вызов; в async-хендлерах
+# гоняем его в отдельном пуле, чтобы не стопорить остальные запросы.
+_hash_executor: Executor | None = None
+
+
+def get_hash_executor() -> Executor:
+    """Пул для хеширования паролей (создаётся лениво по настройкам)."""
+    global _hash_executor
+    if _hash_executor is None:
+        # не os.cpu_count(): в контейнере это ядра хоста, а не квота пода
+        workers = settings.password_hash_workers or available_cpus()
+        if settings.password_hash_executor == "process":
+            _hash_executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            _hash_executor = ThreadPoolExecutor(
+                max_workers=workers,
+                thread_name_prefix="password-hash",
+            )
+    return _hash_executor
+
+
+def shutdown_hash_executor() -> None:
+    """Остановить пул хеширования (вызывается на остановке приложения)."""
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False, cancel_futures=True)
+        _hash_executor = None
+
+
+async def hash_password_async(password: str) -> str:
+    """Получить хэш пароля, не блокируя event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_hash_executor(), hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Проверить пароль на соответствие хэшу, не блокируя event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_hash_executor(), verify_password, plain_password, hashed_password
+    )
+
+
 # -----------------------------
 # JWT-настройки и утилиты
 # -----------------------------
@@ -33,16 +86,21 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 
-def create_access_token(subject: str, expires_delta: timedelta | None = None) -> str:
+def create_access_token(
+    subject: str,
+    expires_delta: timedelta | None = None,
+    claims: dict | None = None,
+) -> str:
     """
     Создать JWT-токен.
     subject — обычно id пользователя (строкой) или его логин.
+    claims — дополнительные поля payload (например, данные пользователя).
     """
     if expires_delta is None:
         expires_delta = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
 
     expire = datetime.now(timezone.utc) + expires_delta
-    to_encode = {"sub": subject, "exp": expire}
+    to_encode = {**(claims or {}), "sub": subject, "exp": expire}
 
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
@@ -0,0 +1,112 @@
+"""
+Миграции на старте контейнера: python -m app.db.migrate
+
+Обычно схема уже актуальна, и полный `alembic upgrade head` (env.py,
+импорт всех моделей, конкуренция подов за миграцию) не нужен.
+Поэтому сначала дёшево сверяем alembic_version с head'ами из
+alembic/versions (читаются только файлы ревизий, без env.py)
+и выходим, если всё совпадает.
+Иначе берём advisory-lock в Postgres (остальные поды ждут на нём),
+перепроверяем версию — её мог обновить под, который держал lock, —
+и только тогда запускаем Alembic на этом же соединении.
+"""
+
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+
+# Ключ advisory-lock'а миграций: мигрирует только один под за раз
+MIGRATION_ADVISORY_LOCK_KEY = 0x6D696772  # "migr"
+
+
+def alembic_config():
+    from alembic.config import Config
+
+    config = Config(str(BASE_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BASE_DIR / "alembic"))
+    return config
+
+
+def script_heads(config=None) -> set[str]:
+    """Head-ревизии из alembic/versions."""
+    from alembic.script import ScriptDirectory
+
+    return set(ScriptDirectory.from_config(config or alembic_config()).get_heads())
+
+
+def current_revisions(conn: Connection) -> set[str]:
+    """Ревизии из alembic_version (пусто, если таблицы ещё нет)."""
+    if not inspect(conn).has_table("alembic_version"):
+        return set()
+    result = conn.execute(text("SELECT version_num FROM alembic_version"))
+    return set(result.scalars().all())
+
+
+@contextmanager
+def _migration_lock(conn: Connection):
+    """
+    Сессионный advisory-lock на время миграции (Postgres).
+    На других БД конкурентов нет — lock не нужен.
+    """
+    if conn.dialect.name != "postgresql":
+        yield
+        return
+
+    conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_ADVISORY_LOCK_KEY})
+    conn.commit()
+    try:
+        yield
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_ADVISORY_LOCK_KEY})
+        conn.commit()
+
+
+def migrate(url: str | None = None) -> bool:
+    """
+    Привести схему к head, если она отстаёт.
+    Возвращает True, если Alembic действительно запускался.
+    """
+    from alembic import command
+
+    config = alembic_config()
+    heads = script_heads(config)
+    engine = create_engine(url or settings.sync_database_url, poolclass=NullPool)
+
+    try:
+        with engine.connect() as conn:
+            if current_revisions(conn) == heads:
+                logger.info("Database schema is up to date (%s)", ", ".join(sorted(heads)))
+                return False
+            conn.rollback()
+
+            with _migration_lock(conn):
+                # пока ждали lock, другой под мог уже всё применить
+                if current_revisions(conn) == heads:
+                    logger.info("Database schema was migrated by another instance")
+                    return False
+
+                logger.info("Applying database migrations up to %s", ", ".join(sorted(heads)))
+                config.attributes["connection"] = conn
+                command.upgrade(config, "head")
+                conn.commit()
+                return True
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    migrate()
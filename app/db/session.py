@@ -1,22 +1,73 @@
+import os
+import time
 from typing import AsyncGenerator
 
 from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
     AsyncSession,
     create_async_engine,
     async_sessionmaker,
 )
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.core.config import settings
 
 
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, который дополнительно считает
+    количество checkout'ов и время ожидания свободного соединения.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.checkout_errors = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            conn = super().connect()
+        except Exception:
+            self.checkout_errors += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+        self.checkouts += 1
+        return conn
+
+
 # Async-движок для SQLAlchemy
 engine = create_async_engine(
     settings.async_database_url,
-    echo=settings.debug,
+    echo=settings.db_echo,
     future=True,
+    poolclass=InstrumentedAsyncPool,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_recycle=settings.db_pool_recycle,
+    pool_pre_ping=settings.db_pool_pre_ping,
+    connect_args={
+        "statement_cache_size": settings.db_statement_cache_size,
+        "prepared_statement_cache_size": settings.db_prepared_statement_cache_size,
+        "command_timeout": settings.db_command_timeout,
+    },
 )
 
 
+# Если процесс форкнули после создания engine (gunicorn --preload и т.п.),
+# ребёнок не должен пользоваться соединениями родителя: забываем пул,
+# не закрывая чужие сокеты, — ребёнок откроет свои.
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=lambda: engine.sync_engine.dispose(close=False))
+
+
 # Фабрика async-сессий
 AsyncSessionLocal = async_sessionmaker(
     bind=engine,
@@ -27,10 +78,38 @@ AsyncSessionLocal = async_sessionmaker(
 )
 
 
+def get_pool_stats(db_engine: AsyncEngine = engine) -> dict:
+    """
+    Текущее состояние пула соединений:
+    занятые/свободные соединения, overflow и время ожидания checkout'а.
+    """
+    pool = db_engine.pool
+    stats = {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": settings.db_max_overflow,
+    }
+
+    if isinstance(pool, InstrumentedAsyncPool):
+        stats.update(
+            checkouts=pool.checkouts,
+            checkout_errors=pool.checkout_errors,
+            wait_seconds_total=round(pool.wait_seconds_total, 6),
+            wait_seconds_max=round(pool.wait_seconds_max, 6),
+            wait_seconds_avg=round(pool.wait_seconds_total / pool.checkouts, 6)
+            if pool.checkouts
+            else 0.0,
+        )
+
+    return stats
+
+
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """
     Dependency для FastAPI: получить async-сессию БД
     и корректно её закрыть.
     """
     async with AsyncSessionLocal() as session:
-        yield session
\ No newline at end of file
+        yield session
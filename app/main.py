@@ -1,11 +1,80 @@
-from fastapi import FastAPI
+import asyncio
+import contextlib
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
 
 from app.api.v1 import api_router
+from app.core import metrics
+from app.core.config import settings
+from app.core.security import shutdown_hash_executor
+from app.db.session import AsyncSessionLocal, engine
+from app.services import lock_events, warmup
+from app.services.health_checker import health_checker
+from app.services.lock_backends import close_lock_backend
+from app.services.lock_reaper import run_lock_reaper
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Жизненный цикл приложения:
+    - на старте прогреваем воркер (соединения пула, схемы) — до этого
+      uvicorn не принимает запросы, так что readiness не станет true раньше
+    - запускаем фоновые задачи: проверку БД для health-проб,
+      reaper протухших lock'ов и LISTEN на события по пользователям;
+      при нескольких воркерах — ещё и снимок пула/кэшей для /metrics
+    - на остановке аккуратно их гасим, закрываем бэкенд аренд,
+      пул хеширования паролей и соединения с БД этого воркера
+    """
+    if settings.startup_warmup:
+        await warmup.warm_up(app, engine)
+
+    tasks = [asyncio.create_task(health_checker.run())]
+    if metrics.multiprocess_dir():
+        metrics.sweep_dead_workers()
+        tasks.append(
+            asyncio.create_task(
+                metrics.run_runtime_publisher(settings.metrics_refresh_interval_seconds)
+            )
+        )
+    if settings.lock_reaper_enabled:
+        tasks.append(asyncio.create_task(run_lock_reaper(AsyncSessionLocal)))
+    if engine.dialect.name == "postgresql":
+        tasks.append(asyncio.create_task(lock_events.run_listener()))
+
+    yield
+
+    for task in tasks:
+        task.cancel()
+    for task in tasks:
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+    await close_lock_backend()
+    shutdown_hash_executor()
+    await engine.dispose()
+    metrics.mark_worker_dead()
+
 
 app = FastAPI(
     title="Botfarm Service",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 
+app.add_middleware(
+    metrics.MetricsMiddleware,
+    stream_paths=frozenset({"/api/v1/users/events"}),
+)
+metrics.instrument_engine(engine)
+
 app.include_router(api_router, prefix="/api/v1")
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint() -> Response:
+    """Метрики в формате Prometheus."""
+    body, content_type = metrics.render_metrics()
+    return Response(content=body, media_type=content_type)
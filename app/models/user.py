@@ -7,6 +7,8 @@ from sqlalchemy import (
     String,
     DateTime,
     Enum,
+    Index,
+    text,
 )
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column
@@ -29,6 +31,55 @@ class User(Base):
     """Модель пользователя ботофермы."""
 
     __tablename__ = "users"
+    __table_args__ = (
+        # Поиск свободного пользователя под project_id/env/domain:
+        # частичный индекс только по незалоченным строкам
+        # (предикат совпадает с первым запросом user_queries.free_candidates)
+        Index(
+            "ix_users_free_lookup",
+            "project_id",
+            "env",
+            "domain",
+            "created_at",
+            "id",
+            postgresql_where=text("locktime IS NULL"),
+        ),
+        # strategy=lru: давно не использовавшиеся свободные пользователи
+        Index(
+            "ix_users_lru_lookup",
+            "project_id",
+            "env",
+            "domain",
+            "last_used_at",
+            "id",
+            postgresql_where=text("locktime IS NULL"),
+        ),
+        # strategy=random: свободные с псевдослучайной точки по id
+        Index(
+            "ix_users_random_lookup",
+            "project_id",
+            "env",
+            "domain",
+            "id",
+            postgresql_where=text("locktime IS NULL"),
+        ),
+        # Keyset-пагинация списка: ORDER BY created_at DESC, id DESC
+        Index("ix_users_created_at_id", "created_at", "id"),
+        # Reaper и предикат «аренда истекла»: WHERE expires_at < now()
+        Index(
+            "ix_users_expires_at",
+            "expires_at",
+            postgresql_where=text("expires_at IS NOT NULL"),
+        ),
+        Index(
+            "ix_users_listing",
+            "project_id",
+            "env",
+            "domain",
+            "created_at",
+            "id",
+        ),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
@@ -76,3 +127,23 @@ class User(Base):
         default=None,
         index=True,
     )
+
+    # Аренда lock'а: до какого момента он действует и кто его держит
+    expires_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+        default=None,
+    )
+
+    lease_token: Mapped[Optional[uuid.UUID]] = mapped_column(
+        UUID(as_uuid=True),
+        nullable=True,
+        default=None,
+    )
+
+    # Когда пользователя последний раз выдавали (для strategy=lru)
+    last_used_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=datetime.utcnow,
+        nullable=False,
+    )
@@ -1,8 +1,10 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Literal, Optional
+
+from typing_extensions import TypedDict
 from uuid import UUID
 
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, TypeAdapter
 
 
 class UserBase(BaseModel):
@@ -16,17 +18,91 @@ class UserCreate(UserBase):
     password: str = Field(..., min_length=6)
 
 
+class UserBulkCreateResponse(BaseModel):
+    created: List[str] = Field(default_factory=list, description="Созданные логины")
+    skipped: List[str] = Field(default_factory=list, description="Уже существующие логины")
+
+
 class UserRead(UserBase):
     id: UUID
     created_at: datetime
     locktime: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True  # для работы с ORM-моделями
 
 
+class UserReadRow(TypedDict):
+    """
+    Те же поля, что у UserRead, но строкой из БД без валидации:
+    для горячих списков/поиска — данные из БД уже проверены при записи.
+    """
+    id: UUID
+    login: str
+    project_id: UUID
+    env: str
+    domain: str
+    created_at: datetime
+    locktime: Optional[datetime]
+    expires_at: Optional[datetime]
+
+
+# Сериализаторы строк в JSON, собираются один раз при импорте
+user_row_adapter = TypeAdapter(UserReadRow)
+user_rows_adapter = TypeAdapter(List[UserReadRow])
+
+
+class UserLease(UserRead):
+    """Пользователь, выданный в аренду: токен нужен для renew/release."""
+    lease_token: Optional[UUID] = None
+
+
+class UserFilter(BaseModel):
+    """Фильтры выборки пользователей (query-параметры)."""
+    project_id: Optional[UUID] = None
+    env: Optional[str] = Field(None, description="Окружение: prod, preprod, stage")
+    domain: Optional[str] = Field(None, description="Тип пользователя: canary, regular")
+
+
+class FreeUserSelection(BaseModel):
+    """Как выбирать свободного пользователя (query-параметры)."""
+    strategy: Optional[Literal["oldest", "lru", "random"]] = Field(
+        None,
+        description="oldest, lru или random (по умолчанию — из настроек)",
+    )
+    caller: Optional[str] = Field(
+        None,
+        description="Идентификатор клиента: для random выбирает «свой» участок таблицы",
+    )
+
+
+class UserPoolStats(BaseModel):
+    """
+    Сколько пользователей свободно/занято в группе project_id/env/domain.
+    free + locked + expired = total; занять сейчас можно free + expired.
+    """
+    project_id: UUID
+    env: str
+    domain: str
+    free: int
+    locked: int
+    expired: int = Field(..., description="Аренда истекла, но reaper ещё не снял lock")
+    total: int
+
+
 class UserLockResponse(BaseModel):
     id: UUID
     locked: bool
     locktime: Optional[datetime]
+    expires_at: Optional[datetime] = None
+    lease_token: Optional[UUID] = None
     message: str
+
+
+class UserLockOutcome(BaseModel):
+    """Результат массового acquire/release по одному пользователю."""
+    id: UUID
+    status: Literal["locked", "released", "already_locked", "not_locked", "not_found", "conflict"]
+    expires_at: Optional[datetime] = None
+    lease_token: Optional[UUID] = None
@@ -0,0 +1,68 @@
+"""
+Запуск сервиса в несколько воркеров uvicorn: python -m app.server
+
+Число воркеров — settings.web_workers, по умолчанию по доступным ядрам
+с учётом CPU-квоты контейнера (cgroup). Воркеры стартуют отдельными
+процессами (spawn) и сами импортируют app.main, поэтому engine, пул
+соединений и фоновые задачи у каждого свои; здесь app.main/app.db
+не импортируем. По SIGTERM uvicorn перестаёт принимать соединения
+и ждёт текущие запросы до web_graceful_timeout_seconds, затем lifespan
+воркера гасит фоновые задачи и закрывает engine.
+
+Метрики prometheus_client живут в памяти процесса, поэтому при нескольких
+воркерах включаем multiprocess-режим (см. app.core.metrics): каталог
+PROMETHEUS_MULTIPROC_DIR готовим здесь, до старта воркеров, — они
+наследуют окружение и при импорте prometheus_client пишут значения туда.
+"""
+
+import os
+import tempfile
+
+import uvicorn
+
+from app.core.config import settings
+from app.core.cpu import available_cpus
+
+
+def worker_count() -> int:
+    return settings.web_workers or available_cpus()
+
+
+def prepare_metrics_dir(workers: int) -> str | None:
+    """
+    Каталог для multiprocess-метрик: PROMETHEUS_MULTIPROC_DIR из окружения
+    или временный. Файлы прошлого запуска удаляем — иначе счётчики
+    продолжились бы с чужих значений. С одним воркером режим не нужен,
+    если его не включили явно.
+    """
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if path is None:
+        if workers <= 1:
+            return None
+        path = tempfile.mkdtemp(prefix="botofarm-metrics-")
+
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith(".db"):
+            os.remove(os.path.join(path, name))
+
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+    return path
+
+
+def main() -> None:
+    workers = worker_count()
+    prepare_metrics_dir(workers)
+    uvicorn.run(
+        "app.main:app",
+        host=settings.web_host,
+        port=settings.web_port,
+        workers=workers,
+        timeout_graceful_shutdown=settings.web_graceful_timeout_seconds,
+        timeout_keep_alive=settings.web_keepalive_seconds,
+        proxy_headers=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
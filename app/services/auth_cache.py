@@ -0,0 +1,120 @@
+import hashlib
+import hmac
+import time
+from uuid import UUID
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.security import SECRET_KEY, decode_access_token
+from app.schemas.user import UserRead
+
+# login → (HMAC от пароля, хэш пароля из БД на момент успешной проверки).
+# Сам пароль не храним: только keyed digest, бесполезный без SECRET_KEY.
+credential_cache: TTLCache[str, tuple[str, str]] = TTLCache(
+    maxsize=settings.credential_cache_size,
+    ttl=settings.credential_cache_ttl_seconds,
+)
+
+
+def _password_digest(password: str) -> str:
+    return hmac.new(SECRET_KEY.encode(), password.encode(), hashlib.sha256).hexdigest()
+
+
+def is_verified(login: str, password: str, password_hash: str) -> bool:
+    """
+    Был ли этот пароль недавно успешно проверен для этого логина.
+    Если хэш в БД с тех пор поменялся — запись не считается.
+    """
+    cached = credential_cache.get(login)
+    if cached is None:
+        return False
+
+    digest, cached_hash = cached
+    if cached_hash != password_hash:
+        credential_cache.pop(login)
+        return False
+
+    return hmac.compare_digest(digest, _password_digest(password))
+
+
+def remember_verified(login: str, password: str, password_hash: str) -> None:
+    """Запомнить успешную проверку пароля."""
+    credential_cache.set(login, (_password_digest(password), password_hash))
+
+
+def invalidate_credentials(login: str) -> None:
+    """Сбросить кэш для логина (например, при смене пароля)."""
+    credential_cache.pop(login)
+
+
+# -----------------------------
+# Кэш для get_current_user
+# -----------------------------
+
+# токен → payload; живёт не дольше самого токена
+token_cache: TTLCache[str, dict] = TTLCache(
+    maxsize=settings.auth_cache_size,
+    ttl=settings.auth_cache_ttl_seconds,
+)
+
+# id пользователя → снимок UserRead без полей аренды: locktime/expires_at
+# меняются на каждом claim/release, а сбросить кэш всех воркеров нечем —
+# /users/me читает аренду у бэкенда (user_service.with_lease_state)
+user_cache: TTLCache[UUID, UserRead] = TTLCache(
+    maxsize=settings.auth_cache_size,
+    ttl=settings.auth_cache_ttl_seconds,
+)
+
+# поля пользователя, которые кладём в токен при выдаче
+USER_CLAIMS = ("login", "project_id", "env", "domain", "created_at")
+
+# поля аренды: в снимки кэша и claims не попадают
+LEASE_FIELDS = {"locktime": None, "expires_at": None}
+
+
+def user_claims(user) -> dict:
+    """Данные пользователя для встраивания в JWT."""
+    return UserRead.model_validate(user).model_dump(mode="json", include=set(USER_CLAIMS))
+
+
+def decode_token_cached(token: str) -> dict:
+    """
+    Декодировать JWT с кэшированием payload.
+    Невалидный токен — JWTError, как и у decode_access_token.
+    """
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
+
+    payload = decode_access_token(token)
+    ttl = settings.auth_cache_ttl_seconds
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        ttl = min(ttl, exp - time.time())
+    if ttl > 0:
+        token_cache.set(token, payload, ttl=ttl)
+    return payload
+
+
+def user_from_claims(user_id: UUID, payload: dict) -> UserRead | None:
+    """Собрать пользователя из claims токена (если их хватает)."""
+    if not all(payload.get(name) is not None for name in USER_CLAIMS):
+        return None
+    return UserRead.model_validate({**payload, "id": user_id, **LEASE_FIELDS})
+
+
+def remember_user(user) -> UserRead:
+    """Положить пользователя в кэш и вернуть его снимок (без аренды)."""
+    snapshot = UserRead.model_validate(user).model_copy(update=LEASE_FIELDS)
+    user_cache.set(snapshot.id, snapshot)
+    return snapshot
+
+
+def invalidate_user(user_id: UUID, login: str | None = None) -> None:
+    """
+    Явно сбросить всё закэшированное по пользователю:
+    снимок для get_current_user и (если передан login) проверку пароля.
+    """
+    user_cache.pop(user_id)
+    if login is not None:
+        invalidate_credentials(login)
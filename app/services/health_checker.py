@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DBHealth:
+    """Результат одной проверки БД."""
+    status: str
+    checked_at: datetime
+    latency_ms: float
+    error: str | None = None
+
+
+async def check_db(db: AsyncSession) -> dict:
+    """
+    Проверка доступности БД.
+    Делаем простой SELECT 1 через переданную async-сессию.
+    """
+    try:
+        await db.execute(text("SELECT 1"))
+        return {"status": "ok"}
+    except Exception as exc:
+        # В логах всё равно будет traceback от uvicorn
+        return {"status": "error", "error": str(exc)}
+
+
+class HealthChecker:
+    """
+    Фоновая проверка БД: раз в interval делает SELECT 1 и запоминает результат.
+    Пробы k8s отвечают из этого состояния и не берут соединение из пула.
+
+    Заодно меряет лаг event loop'а: насколько позже запланированного
+    мы просыпаемся между проверками.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+        interval: float | None = None,
+        timeout: float | None = None,
+    ) -> None:
+        self.session_factory = session_factory
+        self.interval = interval or settings.health_check_interval_seconds
+        self.timeout = timeout or settings.health_check_timeout_seconds
+        self.state: DBHealth | None = None
+        self.loop_lag_seconds = 0.0
+        self.loop_lag_max_seconds = 0.0
+
+    async def check_once(self) -> DBHealth:
+        """Проверить БД прямо сейчас и обновить состояние."""
+        started = time.perf_counter()
+        try:
+            async with self.session_factory() as db:
+                result = await asyncio.wait_for(check_db(db), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            result = {"status": "error", "error": "timeout"}
+        except Exception as exc:
+            result = {"status": "error", "error": str(exc)}
+
+        self.state = DBHealth(
+            status=result["status"],
+            checked_at=datetime.now(timezone.utc),
+            latency_ms=round((time.perf_counter() - started) * 1000, 3),
+            error=result.get("error"),
+        )
+        return self.state
+
+    async def run(self) -> None:
+        """Бесконечный цикл проверок, запускается из lifespan приложения."""
+        while True:
+            try:
+                await self.check_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Health check iteration failed")
+
+            planned = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            self.loop_lag_seconds = max(time.perf_counter() - planned, 0.0)
+            self.loop_lag_max_seconds = max(self.loop_lag_max_seconds, self.loop_lag_seconds)
+
+    def snapshot(self) -> dict | None:
+        """
+        Закэшированный статус БД с указанием «возраста».
+        Слишком старый результат (фоновая проверка встала) считаем ошибкой.
+        None — проверок ещё не было.
+        """
+        if self.state is None:
+            return None
+
+        age = (datetime.now(timezone.utc) - self.state.checked_at).total_seconds()
+        stale = age > settings.health_max_staleness_seconds
+        status = "error" if stale else self.state.status
+
+        snapshot = {
+            "status": status,
+            "checked_at": self.state.checked_at.isoformat(),
+            "age_seconds": round(age, 3),
+            "stale": stale,
+            "latency_ms": self.state.latency_ms,
+        }
+        if stale:
+            snapshot["error"] = "health check result is stale"
+        elif self.state.error is not None:
+            snapshot["error"] = self.state.error
+        return snapshot
+
+    def loop_stats(self) -> dict:
+        return {
+            "tasks": len(asyncio.all_tasks()),
+            "lag_seconds": round(self.loop_lag_seconds, 6),
+            "lag_max_seconds": round(self.loop_lag_max_seconds, 6),
+        }
+
+
+health_checker = HealthChecker()
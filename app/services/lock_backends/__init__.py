@@ -0,0 +1,31 @@
+from app.core.config import settings
+from app.services.lock_backends.base import LockBackend
+from app.services.lock_backends.postgres import PostgresLockBackend
+
+__all__ = ["LockBackend", "PostgresLockBackend", "get_lock_backend", "close_lock_backend"]
+
+_backend: LockBackend | None = None
+
+
+def get_lock_backend() -> LockBackend:
+    """
+    Бэкенд аренд, выбранный в settings.lock_backend (создаётся при первом вызове).
+    Redis-бэкенд импортируется только если выбран — пакет redis опционален.
+    """
+    global _backend
+    if _backend is None:
+        if settings.lock_backend == "redis":
+            from app.services.lock_backends.redis import RedisLockBackend
+
+            _backend = RedisLockBackend()
+        else:
+            _backend = PostgresLockBackend()
+    return _backend
+
+
+async def close_lock_backend() -> None:
+    """Закрыть соединения бэкенда (вызывается из lifespan)."""
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
@@ -0,0 +1,133 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.user import User
+from app.schemas.user import (
+    FreeUserSelection,
+    UserFilter,
+    UserLockOutcome,
+    UserLockResponse,
+    UserReadRow,
+)
+
+
+class LockBackend(ABC):
+    """
+    Где хранится состояние аренд пользователей.
+
+    Каталог пользователей (project_id/env/domain, created_at, last_used_at)
+    всегда живёт в таблице users, а lock'и — в бэкенде:
+    - postgres — колонки locktime/expires_at/lease_token той же таблицы
+    - redis — ключи с TTL, без записи в users на каждый lock/unlock
+
+    Ошибки (404/409) бэкенд поднимает сам через HTTPException,
+    события (lock_events) публикует тоже он — в той же транзакции сессии db.
+    """
+
+    name: str
+    # видно ли состояние аренд в колонках users (фильтр locked в GET /users)
+    locks_in_db: bool = True
+
+    @abstractmethod
+    async def find_free(
+        self,
+        db: AsyncSession,
+        filters: UserFilter | None,
+        selection: FreeUserSelection | None,
+    ) -> UserReadRow | None:
+        """Найти свободного пользователя, не занимая его (строка с колонками UserRead)."""
+
+    @abstractmethod
+    async def claim(
+        self,
+        db: AsyncSession,
+        count: int,
+        filters: UserFilter | None,
+        ttl: int | None,
+        selection: FreeUserSelection | None,
+    ) -> list[User]:
+        """Атомарно занять до count свободных пользователей с общим lease_token."""
+
+    @abstractmethod
+    async def acquire(
+        self,
+        db: AsyncSession,
+        user_id: UUID,
+        ttl: int | None,
+    ) -> UserLockResponse:
+        """Занять конкретного пользователя (404 — нет такого, 409 — уже занят)."""
+
+    @abstractmethod
+    async def renew(
+        self,
+        db: AsyncSession,
+        user_id: UUID,
+        lease_token: UUID,
+        ttl: int | None,
+    ) -> UserLockResponse:
+        """Продлить аренду держателем lease_token (404 / 409)."""
+
+    @abstractmethod
+    async def release(
+        self,
+        db: AsyncSession,
+        user_id: UUID,
+        lease_token: UUID | None,
+    ) -> UserLockResponse:
+        """Снять аренду; без lease_token — безусловно (404 / 409)."""
+
+    @abstractmethod
+    async def acquire_many(
+        self,
+        db: AsyncSession,
+        user_ids: list[UUID],
+        ttl: int | None,
+    ) -> list[UserLockOutcome]:
+        """
+        Занять пользователей по списку id с общим lease_token.
+        Результат по каждому id: locked, already_locked или not_found.
+        """
+
+    @abstractmethod
+    async def release_many(
+        self,
+        db: AsyncSession,
+        user_ids: list[UUID] | None,
+        filters: UserFilter | None,
+        lease_token: UUID | None,
+    ) -> list[UserLockOutcome]:
+        """
+        Снять аренды по списку id и/или фильтру (с lease_token — только свои).
+        По списку id — результат по каждому: released, not_locked, conflict
+        или not_found; по одному фильтру — только снятые.
+        """
+
+    @abstractmethod
+    async def lease_state(
+        self,
+        db: AsyncSession,
+        user_id: UUID,
+    ) -> tuple[datetime | None, datetime | None]:
+        """locktime и expires_at аренды пользователя; (None, None) — не занят."""
+
+    async def held_by_group(
+        self,
+        db: AsyncSession,
+        filters: UserFilter | None,
+    ) -> dict[tuple, int]:
+        """
+        Занятые вне таблицы users по группам (project_id, env, domain) —
+        их /users/stats переносит из free в locked. Если аренды хранятся
+        в самой таблице, добавлять нечего.
+        """
+        return {}
+
+    @abstractmethod
+    async def expire_stale(self, db: AsyncSession) -> int:
+        """Снять протухшие аренды, вернуть их количество."""
+
+    async def close(self) -> None:
+        """Освободить ресурсы бэкенда при остановке приложения."""
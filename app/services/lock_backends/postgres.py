@@ -0,0 +1,376 @@
+import uuid
+from datetime import datetime
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import metrics
+from app.models.user import User
+from app.schemas.user import (
+    FreeUserSelection,
+    UserFilter,
+    UserLockOutcome,
+    UserLockResponse,
+    UserReadRow,
+)
+from app.services import lock_events
+from app.services.lock_backends.base import LockBackend
+from app.services.user_queries import (
+    READ_COLUMNS,
+    RELEASED_VALUES,
+    apply_filters,
+    free_candidates,
+    free_predicate,
+    lease_expiry,
+    lock_response,
+    utcnow,
+)
+
+
+async def _existing_ids(db: AsyncSession, user_ids: list[UUID]) -> set[UUID]:
+    """Какие из id есть в таблице users (пустой список — без запроса)."""
+    if not user_ids:
+        return set()
+    result = await db.execute(select(User.id).where(User.id.in_(user_ids)))
+    return set(result.scalars().all())
+
+
+# что возвращают acquire/release: поля ответа и project_id/env/domain для событий
+_LOCK_RETURNING = (
+    User.id,
+    User.locktime,
+    User.expires_at,
+    User.lease_token,
+    User.project_id,
+    User.env,
+    User.domain,
+)
+
+
+def _release_status(user_id: UUID, released_ids: set[UUID], locktimes: dict) -> str:
+    if user_id in released_ids:
+        return "released"
+    if user_id not in locktimes:
+        return "not_found"
+    # lock снят кем-то раньше или держится другим токеном
+    return "not_locked" if locktimes[user_id] is None else "conflict"
+
+
+class PostgresLockBackend(LockBackend):
+    """
+    Аренды в колонках locktime/expires_at/lease_token таблицы users.
+    Каждый lock/unlock — UPDATE строки (в тестах тот же код работает на SQLite).
+    """
+
+    name = "postgres"
+
+    async def find_free(
+        self,
+        db: AsyncSession,
+        filters: UserFilter | None,
+        selection: FreeUserSelection | None,
+    ) -> UserReadRow | None:
+        base = apply_filters(select(*READ_COLUMNS), filters)
+
+        for stmt in free_candidates(base, utcnow(), selection):
+            result = await db.execute(stmt.limit(1))
+            row = result.mappings().first()
+            if row is not None:
+                return dict(row)
+
+        return None
+
+    async def claim(
+        self,
+        db: AsyncSession,
+        count: int,
+        filters: UserFilter | None,
+        ttl: int | None,
+        selection: FreeUserSelection | None,
+    ) -> list[User]:
+        """
+        Один запрос вида
+        UPDATE users SET locktime = now(), expires_at = ..., lease_token = ...
+        WHERE id IN (SELECT id ... LIMIT :count FOR UPDATE SKIP LOCKED)
+        RETURNING *
+        — конкурентные клиенты пропускают строки, которые уже кто-то забирает,
+        поэтому не получают одних и тех же пользователей.
+        Следующий запрос из free_candidates (протухшие аренды, «заворот»
+        strategy=random через начало таблицы) — только если предыдущих не хватило.
+        """
+        now = utcnow()
+        values = {
+            "locktime": now,
+            "expires_at": lease_expiry(now, ttl),
+            "lease_token": uuid.uuid4(),
+            "last_used_at": now,
+        }
+        base = apply_filters(select(User.id), filters)
+
+        users: list[User] = []
+        for candidates in free_candidates(base, now, selection):
+            stmt = (
+                update(User)
+                .where(
+                    User.id.in_(
+                        candidates.limit(count - len(users)).with_for_update(skip_locked=True)
+                    )
+                )
+                .values(**values)
+                .returning(User)
+                .execution_options(synchronize_session=False)
+            )
+            result = await db.execute(stmt)
+            users.extend(result.scalars().all())
+            if len(users) >= count:
+                break
+
+        await lock_events.publish(db, "locked", users)
+        await db.commit()
+        return users
+
+    async def acquire(
+        self,
+        db: AsyncSession,
+        user_id: UUID,
+        ttl: int | None,
+    ) -> UserLockResponse:
+        """
+        Один UPDATE ... WHERE id = :id AND <свободен> RETURNING:
+        проверка и захват атомарны, двое не займут одного пользователя.
+        Только при промахе — дешёвая проверка существования (404 или 409).
+        """
+        now = utcnow()
+        stmt = (
+            update(User)
+            .where(User.id == user_id)
+            .where(free_predicate(now))
+            .values(
+                locktime=now,
+                expires_at=lease_expiry(now, ttl),
+                lease_token=uuid.uuid4(),
+                last_used_at=now,
+            )
+            .returning(*_LOCK_RETURNING)
+            .execution_options(synchronize_session=False)
+        )
+        result = await db.execute(stmt)
+        row = result.first()
+
+        if row is not None:
+            await lock_events.publish(db, "locked", [row])
+            await db.commit()
+            return lock_response(row, "User successfully locked.")
+
+        if not await _existing_ids(db, [user_id]):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found.",
+            )
+
+        metrics.LOCK_CONFLICTS.inc()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="User is already locked.",
+        )
+
+    async def renew(
+        self,
+        db: AsyncSession,
+        user_id: UUID,
+        lease_token: UUID,
+        ttl: int | None,
+    ) -> UserLockResponse:
+        now = utcnow()
+        stmt = (
+            update(User)
+            .where(User.id == user_id)
+            .where(User.lease_token == lease_token)
+            .where(User.expires_at >= now)
+            .values(expires_at=lease_expiry(now, ttl))
+            .returning(User)
+            .execution_options(synchronize_session=False)
+        )
+        result = await db.execute(stmt)
+        user = result.scalar_one_or_none()
+        await db.commit()
+
+        if user is not None:
+            return lock_response(user, "Lease successfully renewed.")
+
+        if not await _existing_ids(db, [user_id]):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found.",
+            )
+
+        metrics.LOCK_CONFLICTS.inc()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Lease is not held by this token or has expired.",
+        )
+
+    async def release(
+        self,
+        db: AsyncSession,
+        user_id: UUID,
+        lease_token: UUID | None,
+    ) -> UserLockResponse:
+        """
+        Один UPDATE ... WHERE id = :id AND locktime IS NOT NULL
+        [AND lease_token = :token] RETURNING.
+        При промахе одним SELECT различаем 404, «не был залочен» и 409.
+        """
+        stmt = update(User).where(User.id == user_id).where(User.locktime.is_not(None))
+        if lease_token is not None:
+            stmt = stmt.where(User.lease_token == lease_token)
+        stmt = (
+            stmt.values(**RELEASED_VALUES)
+            .returning(*_LOCK_RETURNING)
+            .execution_options(synchronize_session=False)
+        )
+        result = await db.execute(stmt)
+        row = result.first()
+
+        if row is not None:
+            await lock_events.publish(db, "released", [row])
+            await db.commit()
+            return UserLockResponse(
+                id=row.id,
+                locked=False,
+                locktime=None,
+                message="User successfully unlocked.",
+            )
+
+        result = await db.execute(select(User.locktime).where(User.id == user_id))
+        current = result.first()
+
+        if current is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found.",
+            )
+
+        if current.locktime is None:
+            # не считаем это ошибкой, просто возвращаем статус
+            return UserLockResponse(
+                id=user_id,
+                locked=False,
+                locktime=None,
+                message="User was not locked.",
+            )
+
+        metrics.LOCK_CONFLICTS.inc()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Lease is held by another token.",
+        )
+
+    async def acquire_many(
+        self,
+        db: AsyncSession,
+        user_ids: list[UUID],
+        ttl: int | None,
+    ) -> list[UserLockOutcome]:
+        """
+        Один UPDATE ... WHERE id IN (...) AND <свободен> RETURNING;
+        только для не занятых — SELECT, чтобы отличить занятых от несуществующих.
+        """
+        now = utcnow()
+        expires_at = lease_expiry(now, ttl)
+        lease_token = uuid.uuid4()
+        stmt = (
+            update(User)
+            .where(User.id.in_(user_ids))
+            .where(free_predicate(now))
+            .values(
+                locktime=now,
+                expires_at=expires_at,
+                lease_token=lease_token,
+                last_used_at=now,
+            )
+            .returning(User.id, User.project_id, User.env, User.domain)
+            .execution_options(synchronize_session=False)
+        )
+        result = await db.execute(stmt)
+        locked = result.mappings().all()
+        await lock_events.publish(db, "locked", locked)
+        await db.commit()
+
+        locked_ids = {row["id"] for row in locked}
+        existing = await _existing_ids(db, [i for i in user_ids if i not in locked_ids])
+
+        return [
+            UserLockOutcome(id=user_id, status="locked", expires_at=expires_at, lease_token=lease_token)
+            if user_id in locked_ids
+            else UserLockOutcome(id=user_id, status="already_locked" if user_id in existing else "not_found")
+            for user_id in user_ids
+        ]
+
+    async def release_many(
+        self,
+        db: AsyncSession,
+        user_ids: list[UUID] | None,
+        filters: UserFilter | None,
+        lease_token: UUID | None,
+    ) -> list[UserLockOutcome]:
+        """Один UPDATE ... RETURNING; разбор промахов — SELECT только по ним."""
+        stmt = apply_filters(update(User), filters).where(User.locktime.is_not(None))
+        if user_ids is not None:
+            stmt = stmt.where(User.id.in_(user_ids))
+        if lease_token is not None:
+            stmt = stmt.where(User.lease_token == lease_token)
+        stmt = (
+            stmt.values(**RELEASED_VALUES)
+            .returning(User.id, User.project_id, User.env, User.domain)
+            .execution_options(synchronize_session=False)
+        )
+        result = await db.execute(stmt)
+        released = result.mappings().all()
+        await lock_events.publish(db, "released", released)
+        await db.commit()
+
+        if user_ids is None:
+            return [UserLockOutcome(id=row["id"], status="released") for row in released]
+
+        released_ids = {row["id"] for row in released}
+        missed = [i for i in user_ids if i not in released_ids]
+        locktimes = {}
+        if missed:
+            result = await db.execute(
+                select(User.id, User.locktime).where(User.id.in_(missed))
+            )
+            locktimes = {row.id: row.locktime for row in result}
+
+        return [
+            UserLockOutcome(id=user_id, status=_release_status(user_id, released_ids, locktimes))
+            for user_id in user_ids
+        ]
+
+    async def lease_state(
+        self,
+        db: AsyncSession,
+        user_id: UUID,
+    ) -> tuple[datetime | None, datetime | None]:
+        result = await db.execute(
+            select(User.locktime, User.expires_at).where(User.id == user_id)
+        )
+        row = result.first()
+        return (row.locktime, row.expires_at) if row is not None else (None, None)
+
+    async def expire_stale(self, db: AsyncSession) -> int:
+        """Один UPDATE по индексу на expires_at."""
+        stmt = (
+            update(User)
+            .where(User.expires_at < utcnow())
+            .values(**RELEASED_VALUES)
+            .returning(User.id, User.project_id, User.env, User.domain)
+            .execution_options(synchronize_session=False)
+        )
+        result = await db.execute(stmt)
+        expired = result.mappings().all()
+        await lock_events.publish(db, "expired", expired)
+        await db.commit()
+        return len(expired)
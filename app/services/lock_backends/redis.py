@@ -0,0 +1,569 @@
+import uuid
+from datetime import datetime
+from typing import Any
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core import metrics
+from app.core.config import settings
+from app.models.user import User
+from app.schemas.user import (
+    FreeUserSelection,
+    UserFilter,
+    UserLockOutcome,
+    UserLockResponse,
+    UserReadRow,
+)
+from app.services import lock_events
+from app.services.lock_backends.base import LockBackend
+from app.services.user_queries import (
+    EXPIRED_ORDER,
+    READ_COLUMNS,
+    STRATEGY_ORDER,
+    apply_filters,
+    expired_candidates,
+    lease_expiry,
+    lock_response,
+    order_key,
+    ordered_candidates,
+    selection_strategy,
+    utcnow,
+)
+
+# Занять свободные ключи из KEYS (по порядку), но не больше ARGV[3].
+# Возвращает номера (с 1) занятых ключей.
+_CLAIM_SCRIPT = """
+local claimed = {}
+local limit = tonumber(ARGV[3])
+for i, key in ipairs(KEYS) do
+  if redis.call('SET', key, ARGV[1], 'NX', 'PX', ARGV[2]) then
+    claimed[#claimed + 1] = i
+    if #claimed >= limit then
+      break
+    end
+  end
+end
+return claimed
+"""
+
+# Продлить аренду, если ключ держится токеном ARGV[1] ("<token>|").
+# Возвращает новое значение ключа или nil.
+_RENEW_SCRIPT = """
+local value = redis.call('GET', KEYS[1])
+if not value or string.sub(value, 1, #ARGV[1]) ~= ARGV[1] then
+  return false
+end
+local locktime = string.match(value, '^[^|]*|([^|]*)|')
+local renewed = ARGV[1] .. locktime .. '|' .. ARGV[2]
+redis.call('SET', KEYS[1], renewed, 'PX', ARGV[3])
+return renewed
+"""
+
+# Снять аренды по ключам KEYS. По каждому ключу: 1 — сняли,
+# 0 — lock'а не было, -1 — держится другим токеном.
+# Пустой ARGV[1] — снять безусловно.
+_RELEASE_SCRIPT = """
+local results = {}
+for i, key in ipairs(KEYS) do
+  local value = redis.call('GET', key)
+  if not value then
+    results[i] = 0
+  elseif ARGV[1] ~= '' and string.sub(value, 1, #ARGV[1]) ~= ARGV[1] then
+    results[i] = -1
+  else
+    redis.call('DEL', key)
+    results[i] = 1
+  end
+end
+return results
+"""
+
+_RELEASE_STATUSES = {1: "released", 0: "not_locked", -1: "conflict"}
+
+
+def _text(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _lease_value(lease_token: UUID, locktime: datetime, expires_at: datetime) -> str:
+    """Значение ключа аренды: "<lease_token>|<locktime>|<expires_at>"."""
+    return f"{lease_token}|{locktime.isoformat()}|{expires_at.isoformat()}"
+
+
+def _parse_lease(value: Any) -> tuple[UUID, datetime, datetime]:
+    lease_token, locktime, expires_at = _text(value).split("|")
+    return UUID(lease_token), datetime.fromisoformat(locktime), datetime.fromisoformat(expires_at)
+
+
+def _token_prefix(lease_token: UUID | None) -> str:
+    """Начало значения ключа для сверки токена в скриптах; "" — без сверки."""
+    return f"{lease_token}|" if lease_token is not None else ""
+
+
+def _ttl_ms(now: datetime, expires_at: datetime) -> int:
+    return max(int((expires_at - now).total_seconds() * 1000), 1)
+
+
+class RedisLockBackend(LockBackend):
+    """
+    Аренды в Redis (или совместимом по протоколу сервере):
+    ключ {redis_lock_prefix}:lock:{user_id} со значением
+    "<lease_token>|<locktime>|<expires_at>" и TTL, равным аренде.
+
+    Таблица users используется как каталог — кандидаты выбираются
+    из неё с фильтрами и порядком стратегии, а занимаются атомарным
+    Lock/unlock не пишут в Postgres (нет row-lock'ов и лишних версий строк),
+    протухшие аренды Redis удаляет сам. Исключение — стратегия lru:
+    выдача обновляет last_used_at выданных строк (одним UPDATE), чтобы
+    занятые ушли в хвост порядка и скан их не перебирал.
+    Для strategy=oldest скан начинается с курсора в Redis — ключа
+    последнего выданного пользователя — и «заворачивает» на начало,
+    поэтому выдача идёт по кругу в порядке возраста, а не всегда с головы.
+
+    Ограничения:
+    - фильтр locked в GET /users не поддерживается (400), а /users/stats
+      добавляет занятых в Redis отдельным проходом по ключам (SCAN)
+    - истечение TTL не публикует событие expired: long-poll ожидающие
+      перепроверяют раз в free_user_wait_recheck_seconds
+    """
+
+    name = "redis"
+    locks_in_db = False
+
+    def __init__(self, client: Any = None, prefix: str | None = None):
+        if client is None:
+            # redis — опциональная зависимость (requirements-redis.txt),
+            # нужна только этому бэкенду
+            from redis.asyncio import Redis
+
+            client = Redis.from_url(settings.redis_url, decode_responses=True)
+
+        self.client = client
+        self.prefix = prefix or settings.redis_lock_prefix
+        self._claim = client.register_script(_CLAIM_SCRIPT)
+        self._renew = client.register_script(_RENEW_SCRIPT)
+        self._release = client.register_script(_RELEASE_SCRIPT)
+
+    def _key(self, user_id: UUID) -> str:
+        return f"{self.prefix}:lock:{user_id}"
+
+    def _cursor_key(self, filters: UserFilter | None) -> str:
+        """Курсор strategy=oldest — свой у каждой комбинации фильтров."""
+        group = (filters.project_id, filters.env, filters.domain) if filters else (None, None, None)
+        return f"{self.prefix}:cursor:" + "|".join("" if v is None else str(v) for v in group)
+
+    async def _cursor(self, filters: UserFilter | None) -> tuple | None:
+        value = await self.client.get(self._cursor_key(filters))
+        if value is None:
+            return None
+        created_at, user_id = _text(value).split("|")
+        return datetime.fromisoformat(created_at), UUID(user_id)
+
+    async def _advance_cursor(self, filters: UserFilter | None, row) -> None:
+        # подсказка, а не инвариант: гонка двух claim'ов безопасна
+        await self.client.set(
+            self._cursor_key(filters),
+            f"{row['created_at'].isoformat()}|{row['id']}",
+            ex=settings.lock_timeout_seconds,
+        )
+
+    async def _candidate_batches(
+        self,
+        db: AsyncSession,
+        filters: UserFilter | None,
+        selection: FreeUserSelection | None,
+    ):
+        """
+        Кандидаты из каталога пачками по redis_lock_scan_batch в порядке
+        стратегии (строки, залоченные в самой БД, пропускаем).
+        Только id и ключи сортировки; следующая пачка — keyset после
+        последней строки, а не растущий OFFSET.
+        """
+        batch_size = settings.redis_lock_scan_batch
+        base = apply_filters(
+            select(User.id, User.created_at, User.last_used_at, User.expires_at), filters
+        )
+
+        strategy = selection_strategy(selection)
+        order = STRATEGY_ORDER[strategy]
+        start = await self._cursor(filters) if strategy == "oldest" else None
+        unlocked = base.where(User.locktime.is_(None))
+        phases = [(stmt, order) for stmt in ordered_candidates(unlocked, selection, start)]
+        phases.append((expired_candidates(base, utcnow()), EXPIRED_ORDER))
+
+        for stmt, order in phases:
+            page = stmt
+            while True:
+                result = await db.execute(page.limit(batch_size))
+                batch = result.mappings().all()
+                if batch:
+                    yield batch
+                if len(batch) < batch_size:
+                    break
+                last = tuple(batch[-1][column.key] for column in order)
+                page = stmt.where(order_key(order) > order_key(order, last))
+
+    async def _touch(
+        self,
+        db: AsyncSession,
+        user_ids: list[UUID],
+        now: datetime,
+        selection: FreeUserSelection | None = None,
+    ) -> bool:
+        """
+        last_used_at выданных пользователей — одним UPDATE, только для lru
+        (acquire по id — если lru стратегия по умолчанию). last_used_at входит
+        в ix_users_lru_lookup, так что UPDATE не HOT: новые записи во всех
+        индексах, WAL и row-lock'и — для random/oldest это пустая работа.
+        Строки только что заняты в Redis этим вызовом, конкурентов на них нет.
+        """
+        if not user_ids or selection_strategy(selection) != "lru":
+            return False
+
+        await db.execute(
+            update(User)
+            .where(User.id.in_(user_ids))
+            .values(last_used_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        return True
+
+    async def _undo_claim(self, user_ids: list[UUID], lease_token: UUID) -> None:
+        """
+        Снять только что занятые ключи, если дальнейшая работа с БД упала:
+        иначе пользователи висели бы до конца TTL под токеном,
+        который клиент так и не получил.
+        """
+        if user_ids:
+            await self._release(
+                keys=[self._key(user_id) for user_id in user_ids],
+                args=[_token_prefix(lease_token)],
+            )
+
+    async def _load_users(self, db: AsyncSession, user_ids: list[UUID]) -> list[User]:
+        """ORM-объекты в порядке user_ids (populate_existing — свежий last_used_at)."""
+        if not user_ids:
+            return []
+        result = await db.execute(
+            select(User).where(User.id.in_(user_ids)).execution_options(populate_existing=True)
+        )
+        by_id = {user.id: user for user in result.scalars()}
+        return [by_id[user_id] for user_id in user_ids if user_id in by_id]
+
+    @staticmethod
+    def _mark_locked(
+        user: User,
+        lease_token: UUID | None,
+        locktime: datetime | None,
+        expires_at: datetime | None,
+    ) -> None:
+        # только в объекте: сессия не считает его изменённым и не пишет в БД
+        set_committed_value(user, "locktime", locktime)
+        set_committed_value(user, "expires_at", expires_at)
+        set_committed_value(user, "lease_token", lease_token)
+
+    async def _get_user(self, db: AsyncSession, user_id: UUID) -> User:
+        result = await db.execute(select(User).where(User.id == user_id))
+        user = result.scalar_one_or_none()
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found.",
+            )
+        return user
+
+    async def find_free(
+        self,
+        db: AsyncSession,
+        filters: UserFilter | None,
+        selection: FreeUserSelection | None,
+    ) -> UserReadRow | None:
+        async for rows in self._candidate_batches(db, filters, selection):
+            leases = await self.client.mget([self._key(row["id"]) for row in rows])
+            for row, lease in zip(rows, leases):
+                if lease is None:
+                    # следующий /free начнёт после выданного — меньше 409 на acquire
+                    if selection_strategy(selection) == "oldest":
+                        await self._advance_cursor(filters, row)
+                    result = await db.execute(select(*READ_COLUMNS).where(User.id == row["id"]))
+                    found = result.mappings().first()
+                    return dict(found) if found is not None else None
+
+        return None
+
+    async def claim(
+        self,
+        db: AsyncSession,
+        count: int,
+        filters: UserFilter | None,
+        ttl: int | None,
+        selection: FreeUserSelection | None,
+    ) -> list[User]:
+        now = utcnow()
+        expires_at = lease_expiry(now, ttl)
+        lease_token = uuid.uuid4()
+        value = _lease_value(lease_token, now, expires_at)
+
+        claimed = []
+        async for batch in self._candidate_batches(db, filters, selection):
+            indexes = await self._claim(
+                keys=[self._key(row["id"]) for row in batch],
+                args=[value, _ttl_ms(now, expires_at), count - len(claimed)],
+            )
+            claimed.extend(batch[int(i) - 1] for i in indexes)
+            if len(claimed) >= count:
+                break
+
+        if claimed and selection_strategy(selection) == "oldest":
+            await self._advance_cursor(filters, claimed[-1])
+
+        user_ids = [row["id"] for row in claimed]
+        try:
+            await self._touch(db, user_ids, now, selection)
+            users = await self._load_users(db, user_ids)
+            await lock_events.publish(db, "locked", users)
+            await db.commit()
+        except BaseException:
+            await self._undo_claim(user_ids, lease_token)
+            raise
+
+        for user in users:
+            self._mark_locked(user, lease_token, now, expires_at)
+        return users
+
+    async def acquire(
+        self,
+        db: AsyncSession,
+        user_id: UUID,
+        ttl: int | None,
+    ) -> UserLockResponse:
+        user = await self._get_user(db, user_id)
+
+        now = utcnow()
+        expires_at = lease_expiry(now, ttl)
+        lease_token = uuid.uuid4()
+        claimed = await self._claim(
+            keys=[self._key(user_id)],
+            args=[_lease_value(lease_token, now, expires_at), _ttl_ms(now, expires_at), 1],
+        )
+        if not claimed:
+            metrics.LOCK_CONFLICTS.inc()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="User is already locked.",
+            )
+
+        try:
+            touched = await self._touch(db, [user_id], now)
+            await lock_events.publish(db, "locked", [user])
+            await db.commit()
+        except BaseException:
+            await self._undo_claim([user_id], lease_token)
+            raise
+
+        if touched:
+            set_committed_value(user, "last_used_at", now)
+        self._mark_locked(user, lease_token, now, expires_at)
+        return lock_response(user, "User successfully locked.")
+
+    async def renew(
+        self,
+        db: AsyncSession,
+        user_id: UUID,
+        lease_token: UUID,
+        ttl: int | None,
+    ) -> UserLockResponse:
+        now = utcnow()
+        expires_at = lease_expiry(now, ttl)
+        renewed = await self._renew(
+            keys=[self._key(user_id)],
+            args=[_token_prefix(lease_token), expires_at.isoformat(), _ttl_ms(now, expires_at)],
+        )
+
+        user = await self._get_user(db, user_id)
+
+        if renewed is None:
+            metrics.LOCK_CONFLICTS.inc()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Lease is not held by this token or has expired.",
+            )
+
+        self._mark_locked(user, *_parse_lease(renewed))
+        return lock_response(user, "Lease successfully renewed.")
+
+    async def release(
+        self,
+        db: AsyncSession,
+        user_id: UUID,
+        lease_token: UUID | None,
+    ) -> UserLockResponse:
+        user = await self._get_user(db, user_id)
+
+        [released] = await self._release(
+            keys=[self._key(user_id)],
+            args=[_token_prefix(lease_token)],
+        )
+
+        if released == 0:
+            return UserLockResponse(
+                id=user.id,
+                locked=False,
+                locktime=None,
+                message="User was not locked.",
+            )
+
+        if released < 0:
+            metrics.LOCK_CONFLICTS.inc()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Lease is held by another token.",
+            )
+
+        await lock_events.publish(db, "released", [user])
+        await db.commit()
+
+        return UserLockResponse(
+            id=user.id,
+            locked=False,
+            locktime=None,
+            message="User successfully unlocked.",
+        )
+
+    async def _refs(
+        self,
+        db: AsyncSession,
+        user_ids: list[UUID] | None,
+        filters: UserFilter | None,
+    ) -> list:
+        """id и project_id/env/domain (для событий) существующих пользователей."""
+        stmt = apply_filters(select(User.id, User.project_id, User.env, User.domain), filters)
+        if user_ids is not None:
+            stmt = stmt.where(User.id.in_(user_ids))
+        result = await db.execute(stmt)
+        return result.mappings().all()
+
+    async def acquire_many(
+        self,
+        db: AsyncSession,
+        user_ids: list[UUID],
+        ttl: int | None,
+    ) -> list[UserLockOutcome]:
+        """Существующие id — одним SELECT, занимаем одним вызовом claim-скрипта."""
+        refs = await self._refs(db, user_ids, None)
+
+        now = utcnow()
+        expires_at = lease_expiry(now, ttl)
+        lease_token = uuid.uuid4()
+        claimed = []
+        if refs:
+            indexes = await self._claim(
+                keys=[self._key(ref["id"]) for ref in refs],
+                args=[_lease_value(lease_token, now, expires_at), _ttl_ms(now, expires_at), len(refs)],
+            )
+            claimed = [refs[int(i) - 1] for i in indexes]
+
+        claimed_ids = [ref["id"] for ref in claimed]
+        try:
+            await self._touch(db, claimed_ids, now)
+            await lock_events.publish(db, "locked", claimed)
+            await db.commit()
+        except BaseException:
+            await self._undo_claim(claimed_ids, lease_token)
+            raise
+
+        locked_ids = set(claimed_ids)
+        existing = {ref["id"] for ref in refs}
+        return [
+            UserLockOutcome(id=user_id, status="locked", expires_at=expires_at, lease_token=lease_token)
+            if user_id in locked_ids
+            else UserLockOutcome(id=user_id, status="already_locked" if user_id in existing else "not_found")
+            for user_id in user_ids
+        ]
+
+    async def release_many(
+        self,
+        db: AsyncSession,
+        user_ids: list[UUID] | None,
+        filters: UserFilter | None,
+        lease_token: UUID | None,
+    ) -> list[UserLockOutcome]:
+        """Пользователи — одним SELECT, аренды снимаем одним вызовом release-скрипта."""
+        refs = await self._refs(db, user_ids, filters)
+
+        codes = []
+        if refs:
+            codes = await self._release(
+                keys=[self._key(ref["id"]) for ref in refs],
+                args=[_token_prefix(lease_token)],
+            )
+        statuses = {ref["id"]: _RELEASE_STATUSES[int(code)] for ref, code in zip(refs, codes)}
+
+        released = [ref for ref in refs if statuses[ref["id"]] == "released"]
+        await lock_events.publish(db, "released", released)
+        await db.commit()
+
+        if user_ids is None:
+            return [UserLockOutcome(id=ref["id"], status="released") for ref in released]
+
+        return [
+            UserLockOutcome(id=user_id, status=statuses.get(user_id, "not_found"))
+            for user_id in user_ids
+        ]
+
+    async def held_by_group(
+        self,
+        db: AsyncSession,
+        filters: UserFilter | None,
+    ) -> dict[tuple, int]:
+        """
+        Живые ключи аренд (SCAN по префиксу), сгруппированные по
+        project_id/env/domain запросами по bulk_lock_max id. Строки,
+        залоченные в самой БД, не считаем — их уже учёл запрос статистики.
+        """
+        prefix = f"{self.prefix}:lock:"
+        user_ids = [
+            UUID(_text(key)[len(prefix):])
+            async for key in self.client.scan_iter(
+                match=prefix + "*", count=settings.redis_lock_scan_batch
+            )
+        ]
+
+        held: dict[tuple, int] = {}
+        chunk = settings.bulk_lock_max
+        for offset in range(0, len(user_ids), chunk):
+            stmt = (
+                apply_filters(
+                    select(User.project_id, User.env, User.domain, func.count().label("held")),
+                    filters,
+                )
+                .where(User.id.in_(user_ids[offset:offset + chunk]))
+                .where(User.locktime.is_(None))
+                .group_by(User.project_id, User.env, User.domain)
+            )
+            for row in await db.execute(stmt):
+                group = (row.project_id, row.env, row.domain)
+                held[group] = held.get(group, 0) + row.held
+        return held
+
+    async def lease_state(
+        self,
+        db: AsyncSession,
+        user_id: UUID,
+    ) -> tuple[datetime | None, datetime | None]:
+        value = await self.client.get(self._key(user_id))
+        if value is None:
+            return None, None
+        _, locktime, expires_at = _parse_lease(value)
+        return locktime, expires_at
+
+    async def expire_stale(self, db: AsyncSession) -> int:
+        """Протухшие ключи Redis удаляет сам по TTL — снимать нечего."""
+        return 0
+
+    async def close(self) -> None:
+        await self.client.aclose()
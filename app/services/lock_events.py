@@ -0,0 +1,227 @@
+import asyncio
+import json
+import logging
+from collections import deque
+from typing import Any, Iterable
+
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.schemas.user import UserFilter
+
+logger = logging.getLogger(__name__)
+
+# Канал Postgres LISTEN/NOTIFY для событий по пользователям
+CHANNEL = "botofarm_user_events"
+
+# payload NOTIFY ограничен 8000 байт — режем события на куски
+_USERS_PER_NOTIFY = 50
+# сколько pg_notify(...) отправлять одним SELECT'ом
+_NOTIFIES_PER_STATEMENT = 100
+
+_PENDING_KEY = "pending_user_events"
+
+# типы событий: locked, released, expired, created;
+# после этих появляются свободные пользователи
+FREEING_EVENTS = {"released", "expired", "created"}
+
+
+def _user_ref(user: Any) -> dict:
+    """Минимум данных о пользователе для события: id и project_id/env/domain."""
+    get = user.get if hasattr(user, "get") else lambda name: getattr(user, name)
+    return {
+        "id": str(get("id")),
+        "project_id": str(get("project_id")),
+        "env": get("env"),
+        "domain": get("domain"),
+    }
+
+
+async def publish(db: AsyncSession, event_type: str, users: Iterable[Any]) -> None:
+    """
+    Опубликовать событие по пользователям в рамках текущей транзакции.
+
+    Postgres: pg_notify внутри транзакции — подписчики (во всех репликах,
+    включая нашу) получат событие только после COMMIT.
+    Другие БД (SQLite в тестах): событие копится в сессии и раздаётся
+    локальным подписчикам после commit.
+    """
+    refs = [_user_ref(user) for user in users]
+    if not refs:
+        return
+
+    payloads = [
+        json.dumps({"type": event_type, "users": refs[i:i + _USERS_PER_NOTIFY]})
+        for i in range(0, len(refs), _USERS_PER_NOTIFY)
+    ]
+
+    if db.get_bind().dialect.name != "postgresql":
+        db.info.setdefault(_PENDING_KEY, []).extend(payloads)
+        return
+
+    for i in range(0, len(payloads), _NOTIFIES_PER_STATEMENT):
+        chunk = payloads[i:i + _NOTIFIES_PER_STATEMENT]
+        await db.execute(select(*(func.pg_notify(CHANNEL, payload) for payload in chunk)))
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_pending(session: Session) -> None:
+    for payload in session.info.pop(_PENDING_KEY, ()):
+        dispatch(payload)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def dispatch(payload: str) -> None:
+    """
+    Раздать событие локальным подписчикам процесса.
+    JSON разбираем один раз на событие, сколько бы ни было подписчиков.
+    """
+    try:
+        data = json.loads(payload)
+    except ValueError:
+        logger.warning("Malformed user event payload: %r", payload)
+        return
+
+    if data.get("type") in FREEING_EVENTS:
+        free_user_waiters.wake_for(data.get("users", []))
+
+    user_events.publish(data)
+
+
+def _matches(filters: UserFilter | None, ref: dict) -> bool:
+    if filters is None:
+        return True
+    if filters.project_id is not None and str(filters.project_id) != ref["project_id"]:
+        return False
+    if filters.env is not None and filters.env != ref["env"]:
+        return False
+    if filters.domain is not None and filters.domain != ref["domain"]:
+        return False
+    return True
+
+
+class FreeUserWaiters:
+    """
+    Очередь (FIFO) запросов, ждущих свободного пользователя в этом процессе.
+
+    На каждого освободившегося пользователя будим первого по очереди
+    ожидающего с подходящими фильтрами — остальные спят дальше.
+    """
+
+    def __init__(self) -> None:
+        self._queue: deque[tuple[UserFilter | None, asyncio.Future]] = deque()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def enqueue(self, filters: UserFilter | None, front: bool = False) -> asyncio.Future:
+        """
+        Встать в очередь. front=True — вернуться в начало
+        (разбудили, но пользователя перехватили — очередь не теряем).
+        """
+        waiter = asyncio.get_running_loop().create_future()
+        if front:
+            self._queue.appendleft((filters, waiter))
+        else:
+            self._queue.append((filters, waiter))
+        return waiter
+
+    def discard(self, waiter: asyncio.Future) -> None:
+        for item in self._queue:
+            if item[1] is waiter:
+                self._queue.remove(item)
+                break
+
+    def wake_for(self, users: list[dict]) -> None:
+        for ref in users:
+            for item in self._queue:
+                filters, waiter = item
+                if not waiter.done() and _matches(filters, ref):
+                    waiter.set_result(ref)
+                    self._queue.remove(item)
+                    break
+
+
+free_user_waiters = FreeUserWaiters()
+
+
+class UserEventBroadcaster:
+    """
+    Fan-out событий по пользователям на подписчиков процесса (SSE-клиентов).
+
+    У каждого подписчика своя ограниченная очередь и свои фильтры;
+    медленный клиент не тормозит остальных — при переполнении его
+    очереди событие для него отбрасывается (считаем в dropped).
+    """
+
+    def __init__(self, queue_size: int | None = None) -> None:
+        self.queue_size = queue_size or settings.events_queue_size
+        self.dropped = 0
+        self._subscribers: dict[asyncio.Queue, UserFilter | None] = {}
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, filters: UserFilter | None = None) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[queue] = filters
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.pop(queue, None)
+
+    def publish(self, data: dict) -> None:
+        users = data.get("users", [])
+        for queue, filters in self._subscribers.items():
+            matched = users if filters is None else [u for u in users if _matches(filters, u)]
+            if not matched:
+                continue
+            try:
+                queue.put_nowait({"type": data.get("type"), "users": matched})
+            except asyncio.QueueFull:
+                self.dropped += 1
+
+
+user_events = UserEventBroadcaster()
+
+
+def _listener_dsn() -> str:
+    """DSN для отдельного asyncpg-соединения (без драйвера в схеме)."""
+    return settings.async_database_url.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
+async def run_listener(reconnect_delay: float = 1.0) -> None:
+    """
+    Держать отдельное (не из пула) соединение с LISTEN на канал событий
+    и раздавать пришедшие уведомления локальным подписчикам.
+    При обрыве — переподключаемся.
+    """
+    import asyncpg
+
+    def _on_notify(connection, pid, channel, payload) -> None:
+        dispatch(payload)
+
+    while True:
+        conn = None
+        try:
+            conn = await asyncpg.connect(_listener_dsn())
+            closed = asyncio.Event()
+            conn.add_termination_listener(lambda _conn: closed.set())
+            await conn.add_listener(CHANNEL, _on_notify)
+            await closed.wait()
+            logger.warning("User events listener connection closed, reconnecting")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("User events listener failed, reconnecting")
+        finally:
+            if conn is not None and not conn.is_closed():
+                await conn.close()
+
+        await asyncio.sleep(reconnect_delay)
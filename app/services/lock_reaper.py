@@ -0,0 +1,64 @@
+import asyncio
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.services.user_service import expire_stale_locks
+
+logger = logging.getLogger(__name__)
+
+# Ключ advisory-lock'а: reaper'ом в каждый момент работает только одна реплика
+REAPER_ADVISORY_LOCK_KEY = 0x626F746F  # "boto"
+
+
+async def _try_leader_lock(db: AsyncSession) -> bool:
+    """
+    Попробовать взять транзакционный advisory-lock в Postgres.
+    Lock отпускается сам при commit внутри expire_stale_locks.
+    На других БД (SQLite в тестах) конкурентов нет — считаем, что взяли.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return True
+
+    result = await db.execute(
+        text("SELECT pg_try_advisory_xact_lock(:key)"),
+        {"key": REAPER_ADVISORY_LOCK_KEY},
+    )
+    return bool(result.scalar())
+
+
+async def reap_once(session_factory: async_sessionmaker[AsyncSession]) -> int:
+    """
+    Один проход reaper'а: снять протухшие lock'и, если мы лидер.
+    Возвращает количество освобождённых пользователей.
+    """
+    async with session_factory() as db:
+        if not await _try_leader_lock(db):
+            await db.rollback()
+            return 0
+        return await expire_stale_locks(db)
+
+
+async def run_lock_reaper(
+    session_factory: async_sessionmaker[AsyncSession],
+    interval: float | None = None,
+) -> None:
+    """
+    Бесконечный цикл reaper'а, запускается из lifespan приложения.
+    Ошибки БД логируем и продолжаем — следующий проход попробует снова.
+    """
+    interval = interval or settings.lock_reaper_interval_seconds
+
+    while True:
+        try:
+            released = await reap_once(session_factory)
+            if released:
+                logger.info("Lock reaper released %s stale locks", released)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Lock reaper iteration failed")
+
+        await asyncio.sleep(interval)
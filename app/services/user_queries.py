@@ -0,0 +1,176 @@
+import hashlib
+import uuid
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+from sqlalchemy import Select, and_, literal, or_, tuple_
+
+from app.core.config import settings
+from app.models.user import User
+from app.schemas.user import FreeUserSelection, UserFilter, UserLockResponse
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def lease_expiry(now: datetime, ttl: int | None) -> datetime:
+    """Когда истечёт аренда, взятая сейчас на ttl секунд (по умолчанию — lock_timeout_seconds)."""
+    return now + timedelta(seconds=ttl or settings.lock_timeout_seconds)
+
+
+def free_predicate(now: datetime):
+    """
+    Условие «пользователь свободен»:
+    lock не стоит или аренда уже истекла.
+    """
+    return or_(User.locktime.is_(None), User.expires_at < now)
+
+
+def held_predicate(now: datetime):
+    """
+    Дополнение free_predicate: lock стоит и аренда не истекла.
+    Lock без expires_at тоже занят — а not_(free_predicate) такую строку
+    теряет: NOT (NULL < now) в SQL не true.
+    """
+    return and_(
+        User.locktime.is_not(None),
+        or_(User.expires_at.is_(None), User.expires_at >= now),
+    )
+
+
+def selection_pivot(caller: str | None) -> UUID:
+    """
+    Точка старта для strategy=random: случайный UUID,
+    а при переданном caller — детерминированный hash от него
+    (один и тот же бот стабильно попадает в «свой» участок таблицы).
+    """
+    if caller:
+        return UUID(bytes=hashlib.md5(caller.encode()).digest())
+    return uuid.uuid4()
+
+
+# Порядок выдачи свободных по стратегии. id в конце делает ключ уникальным:
+# по ключу можно стартовать с произвольной точки и продолжать выборку (keyset)
+STRATEGY_ORDER = {
+    "oldest": (User.created_at, User.id),
+    "lru": (User.last_used_at, User.id),
+    "random": (User.id,),
+}
+EXPIRED_ORDER = (User.expires_at, User.id)
+
+
+def selection_strategy(selection: FreeUserSelection | None) -> str:
+    return (selection and selection.strategy) or settings.free_user_strategy
+
+
+def order_key(order: tuple, values: tuple | None = None):
+    """
+    Ключ сортировки для сравнений (колонка или кортеж колонок),
+    а с values — значение ключа в типах этих колонок.
+    """
+    if values is None:
+        items = order
+    else:
+        items = tuple(literal(value, column.type) for value, column in zip(values, order))
+    return items[0] if len(items) == 1 else tuple_(*items)
+
+
+def ordered_candidates(
+    stmt: Select,
+    selection: FreeUserSelection | None,
+    start: tuple | None = None,
+) -> list[Select]:
+    """
+    Упорядочить выборку свободных пользователей по стратегии:
+    - oldest — самые старые по created_at (все конкуренты бьются в одну строку)
+    - lru — давно не использовавшиеся по last_used_at (ровный износ аккаунтов,
+      но конкуренты тоже бьются в одну строку)
+    - random (по умолчанию) — с псевдослучайной точки по первичному ключу
+    С точкой старта (у random — pivot, иначе start — значение ключа
+    STRATEGY_ORDER) возвращаем два запроса, чтобы не потерять строки
+    «до» точки: ключ > start, затем ключ <= start.
+    Запросы выполняются по очереди, пока не наберётся нужное количество.
+    """
+    strategy = selection_strategy(selection)
+    order = STRATEGY_ORDER[strategy]
+    ordered = [column.asc() for column in order]
+
+    if strategy == "random":
+        start = (selection_pivot(selection and selection.caller),)
+    if start is None:
+        return [stmt.order_by(*ordered)]
+
+    key, pivot = order_key(order), order_key(order, start)
+    return [
+        stmt.where(key > pivot).order_by(*ordered),
+        stmt.where(key <= pivot).order_by(*ordered),
+    ]
+
+
+def expired_candidates(stmt: Select, now: datetime) -> Select:
+    """Протухшие аренды (lock стоит, expires_at в прошлом) по ix_users_expires_at."""
+    return (
+        stmt.where(User.locktime.is_not(None))
+        .where(User.expires_at < now)
+        .order_by(*(column.asc() for column in EXPIRED_ORDER))
+    )
+
+
+def free_candidates(
+    stmt: Select,
+    now: datetime,
+    selection: FreeUserSelection | None,
+) -> list[Select]:
+    """
+    Запросы свободных пользователей (см. free_predicate) по очереди:
+    - сначала незалоченные (locktime IS NULL) в порядке стратегии — условие
+      совпадает с предикатом частичных индексов ix_users_*_lookup,
+      и с LIMIT это probe по индексу
+    - затем протухшие аренды по ix_users_expires_at (их немного — снимает reaper)
+    Одним запросом с free_predicate нельзя: Postgres не применяет частичный
+    индекс к условию с OR и строит BitmapOr + сортировку всех свободных строк.
+    """
+    unlocked = stmt.where(User.locktime.is_(None))
+    return [*ordered_candidates(unlocked, selection), expired_candidates(stmt, now)]
+
+
+# Колонки UserRead: списки и поиск выбирают только их, без хеша пароля
+# и без ORM-объектов в identity map сессии
+READ_COLUMNS = (
+    User.id,
+    User.login,
+    User.project_id,
+    User.env,
+    User.domain,
+    User.created_at,
+    User.locktime,
+    User.expires_at,
+)
+
+
+RELEASED_VALUES = {"locktime": None, "expires_at": None, "lease_token": None}
+
+
+def apply_filters(stmt: Select, filters: UserFilter | None) -> Select:
+    """Добавить к запросу фильтры по project_id/env/domain."""
+    if filters is None:
+        return stmt
+    if filters.project_id is not None:
+        stmt = stmt.where(User.project_id == filters.project_id)
+    if filters.env is not None:
+        stmt = stmt.where(User.env == filters.env)
+    if filters.domain is not None:
+        stmt = stmt.where(User.domain == filters.domain)
+    return stmt
+
+
+def lock_response(user: User, message: str) -> UserLockResponse:
+    return UserLockResponse(
+        id=user.id,
+        locked=user.locktime is not None,
+        locktime=user.locktime,
+        expires_at=user.expires_at,
+        lease_token=user.lease_token,
+        message=message,
+    )
@@ -1,16 +1,41 @@
-from datetime import datetime, timezone, timedelta
+import asyncio
+import base64
+import uuid
+from datetime import datetime, timezone
 from typing import Sequence
 from uuid import UUID
 
 from fastapi import HTTPException, status
-from sqlalchemy import select, update
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core import metrics
+from app.core.cache import TTLCache
 from app.core.config import settings
-from app.core.security import hash_password
+from app.core.security import hash_password_async
 from app.models.user import User
-from app.core.security import verify_password
-from app.schemas.user import UserCreate, UserRead, UserLockResponse
+from app.services import auth_cache, lock_events
+from app.services.lock_backends import get_lock_backend
+from app.services.user_queries import (
+    READ_COLUMNS,
+    apply_filters,
+    free_predicate,
+    held_predicate,
+    utcnow,
+)
+from app.core.security import verify_password_async
+from app.schemas.user import (
+    FreeUserSelection,
+    UserBulkCreateResponse,
+    UserCreate,
+    UserFilter,
+    UserLockOutcome,
+    UserLockResponse,
+    UserPoolStats,
+    UserRead,
+    UserReadRow,
+)
 
 
 async def create_user(db: AsyncSession, user_in: UserCreate) -> User:
@@ -29,134 +54,488 @@ async def create_user(db: AsyncSession, user_in: UserCreate) -> User:
             detail="User with this login already exists.",
         )
 
+    now = datetime.now(timezone.utc)
     user = User(
-        # id генерируется в модели через default=uuid4()
-        created_at=datetime.now(timezone.utc),
+        # id задаём сами, чтобы опубликовать событие до commit
+        id=uuid.uuid4(),
+        created_at=now,
+        last_used_at=now,
         login=user_in.login,
-        password=hash_password(user_in.password),
+        password=await hash_password_async(user_in.password),
         project_id=user_in.project_id,
         env=user_in.env,
         domain=user_in.domain,
     )
 
     db.add(user)
+    await lock_events.publish(db, "created", [user])
     await db.commit()
     await db.refresh(user)
     return user
 
 
-async def get_users(db: AsyncSession) -> Sequence[User]:
+def _insert_ignore_conflicts(db: AsyncSession):
     """
-    Получить список всех пользователей, отсортированных по дате создания.
+    INSERT ... ON CONFLICT (login) DO NOTHING для текущего диалекта
+    (Postgres в проде, SQLite в тестах).
     """
-    stmt = select(User).order_by(User.created_at.desc())
-    result = await db.execute(stmt)
-    return result.scalars().all()
+    insert = sqlite.insert if db.get_bind().dialect.name == "sqlite" else postgresql.insert
+    return insert(User).on_conflict_do_nothing(index_elements=[User.login])
+
 
-async def get_free_user(db: AsyncSession) -> User:
+async def create_users_bulk(
+    db: AsyncSession,
+    users_in: Sequence[UserCreate],
+) -> UserBulkCreateResponse:
     """
-    Получить любого свободного (не залоченного) пользователя.
-    Если свободных нет — 404.
+    Массово создать пользователей.
+
+    Пароли хешируем параллельно в пуле хеширования (не блокируя event loop),
+    пишем пачками multi-row INSERT ... ON CONFLICT (login) DO NOTHING RETURNING.
+    Уже существующие логины (и дубли внутри запроса) не ошибка, а skipped.
     """
-    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.lock_timeout_seconds)
+    if len(users_in) > settings.bulk_create_max:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many users in one request (max {settings.bulk_create_max}).",
+        )
+
+    unique: dict[str, UserCreate] = {}
+    skipped: list[str] = []
+    for user_in in users_in:
+        if user_in.login in unique:
+            skipped.append(user_in.login)
+        else:
+            unique[user_in.login] = user_in
+
+    created: list[str] = []
+    items = list(unique.values())
+    batch_size = settings.bulk_insert_batch_size
+
+    for offset in range(0, len(items), batch_size):
+        batch = items[offset:offset + batch_size]
+        hashes = await asyncio.gather(
+            *(hash_password_async(u.password) for u in batch)
+        )
+        now = datetime.now(timezone.utc)
+        rows = [
+            {
+                "id": uuid.uuid4(),
+                "created_at": now,
+                "last_used_at": now,
+                "login": u.login,
+                "password": password_hash,
+                "project_id": u.project_id,
+                "env": u.env,
+                "domain": u.domain,
+            }
+            for u, password_hash in zip(batch, hashes)
+        ]
+
+        stmt = _insert_ignore_conflicts(db).values(rows).returning(User.login)
+        result = await db.execute(stmt)
+        inserted = set(result.scalars().all())
+
+        for u in batch:
+            (created if u.login in inserted else skipped).append(u.login)
+
+        await lock_events.publish(
+            db, "created", (row for row in rows if row["login"] in inserted)
+        )
 
-    clear_stmt = (
-        update(User)
-        .where(User.locktime.is_not(None))
-        .where(User.locktime < cutoff)
-        .values(locktime=None)
-    )
-    await db.execute(clear_stmt)
     await db.commit()
 
+    return UserBulkCreateResponse(created=created, skipped=skipped)
+
+
+def _encode_cursor(row: UserReadRow) -> str:
+    """Курсор keyset-пагинации: (created_at, id) последней строки страницы."""
+    raw = f"{row['created_at'].isoformat()}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    """Разобрать курсор; битый курсор — 400."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, user_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), UUID(user_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor.",
+        )
+
+
+async def get_users(
+    db: AsyncSession,
+    limit: int,
+    cursor: str | None = None,
+    filters: UserFilter | None = None,
+    locked: bool | None = None,
+) -> tuple[list[UserReadRow], str | None]:
+    """
+    Получить страницу пользователей, отсортированных по дате создания (новые сверху).
+
+    Keyset-пагинация по (created_at, id): следующая страница начинается
+    строго после курсора, поэтому стоимость запроса не зависит от «глубины».
+    Выбираем только колонки UserRead и отдаём строки-словари без ORM-объектов.
+    Возвращает (страница, курсор следующей страницы или None).
+    """
+    stmt = apply_filters(select(*READ_COLUMNS), filters)
+
+    if locked is not None:
+        backend = get_lock_backend()
+        if not backend.locks_in_db:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Filter 'locked' is not supported with lock_backend={backend.name}.",
+            )
+        now = utcnow()
+        stmt = stmt.where(held_predicate(now) if locked else free_predicate(now))
+
+    if cursor is not None:
+        created_at, user_id = _decode_cursor(cursor)
+        stmt = stmt.where(
+            or_(
+                User.created_at < created_at,
+                and_(User.created_at == created_at, User.id < user_id),
+            )
+        )
+
+    # берём на одну строку больше — так узнаём, есть ли следующая страница
+    stmt = stmt.order_by(User.created_at.desc(), User.id.desc()).limit(limit + 1)
+    result = await db.execute(stmt)
+    rows = [dict(row) for row in result.mappings()]
+
+    if len(rows) <= limit:
+        return rows, None
+
+    page = rows[:limit]
+    return page, _encode_cursor(page[-1])
+
+
+# результат GET /users/stats по ключу фильтров; живёт пару секунд
+_stats_cache: TTLCache[tuple, list[UserPoolStats]] = TTLCache(
+    maxsize=1024,
+    ttl=settings.users_stats_cache_ttl_seconds,
+)
+
+
+async def get_pool_stats(
+    db: AsyncSession,
+    filters: UserFilter | None = None,
+) -> list[UserPoolStats]:
+    """
+    Свободные/занятые/протухшие пользователи по группам project_id/env/domain.
+
+    Один GROUP BY с условными COUNT(*) FILTER (...) — без выгрузки строк.
+    Корзины делят группу без остатка (free + locked + expired = total):
+    free_predicate — это free (lock не стоит) и expired (аренда истекла),
+    locked — его дополнение held_predicate.
+    Аренды вне таблицы (Redis-бэкенд) бэкенд досчитывает отдельно,
+    они переходят из free в locked.
+    Результат кэшируется на users_stats_cache_ttl_seconds.
+    """
+    key = (filters.project_id, filters.env, filters.domain) if filters else (None, None, None)
+    cached = _stats_cache.get(key)
+    if cached is not None:
+        return cached
+
+    now = utcnow()
+    is_locked = User.locktime.is_not(None)
     stmt = (
-        select(User)
-        .where(User.locktime.is_(None))
-        .order_by(User.created_at.asc())
-        .limit(1)
+        apply_filters(
+            select(
+                User.project_id,
+                User.env,
+                User.domain,
+                func.count().filter(User.locktime.is_(None)).label("free"),
+                func.count().filter(held_predicate(now)).label("locked"),
+                func.count().filter(and_(free_predicate(now), is_locked)).label("expired"),
+                func.count().label("total"),
+            ),
+            filters,
+        )
+        .group_by(User.project_id, User.env, User.domain)
+        .order_by(User.project_id, User.env, User.domain)
     )
     result = await db.execute(stmt)
-    user = result.scalar_one_or_none()
+    rows = result.mappings().all()
+    held = await get_lock_backend().held_by_group(db, filters)
+
+    stats = []
+    for row in rows:
+        extra = held.get((row["project_id"], row["env"], row["domain"]), 0)
+        stats.append(
+            UserPoolStats.model_validate(
+                {**row, "free": row["free"] - extra, "locked": row["locked"] + extra}
+            )
+        )
 
-    if user is None:
+    _stats_cache.set(key, stats)
+    return stats
+
+
+async def _wait_for_free(
+    db: AsyncSession,
+    filters: UserFilter | None,
+    wait: float | None,
+    attempt,
+):
+    """
+    Long-poll: повторять attempt(), пока он не вернёт непустой результат
+    или не выйдет время ожидания wait (сек).
+
+    Между попытками запрос стоит в FIFO-очереди процесса
+    (lock_events.free_user_waiters) и просыпается по событию
+    освобождения подходящего пользователя (LISTEN/NOTIFY), а на случай
+    потерянного события — не реже free_user_wait_recheck_seconds.
+    В очередь встаём до попытки, чтобы не пропустить освобождение между ними.
+    Соединение с БД на время ожидания возвращаем в пул.
+    """
+    if not wait:
+        return await attempt()
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    front = False
+
+    while True:
+        waiter = lock_events.free_user_waiters.enqueue(filters, front=front)
+        try:
+            result = await attempt()
+            remaining = deadline - loop.time()
+            if result or remaining <= 0:
+                return result
+
+            await db.rollback()
+            await asyncio.wait(
+                {waiter},
+                timeout=min(remaining, settings.free_user_wait_recheck_seconds),
+            )
+        finally:
+            lock_events.free_user_waiters.discard(waiter)
+
+        # уже стояли в очереди — не пропускаем вперёд новичков
+        front = True
+
+
+async def get_free_user(
+    db: AsyncSession,
+    filters: UserFilter | None = None,
+    selection: FreeUserSelection | None = None,
+    wait: float | None = None,
+) -> UserReadRow:
+    """
+    Получить любого свободного (не залоченного) пользователя
+    (строка с колонками UserRead),
+    при необходимости — под конкретные project_id/env/domain.
+    Протухшие lock'и считаем свободными прямо в условии запроса,
+    чистит их фоновый reaper (см. expire_stale_locks).
+    wait — сколько секунд ждать, если свободных сейчас нет.
+    Если свободных нет — 404.
+    """
+    row = await _wait_for_free(
+        db, filters, wait, lambda: get_lock_backend().find_free(db, filters, selection)
+    )
+
+    if row is None:
+        metrics.FREE_USERS_EXHAUSTED.inc()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No free users available.",
         )
 
-    return user
+    return row
+
 
-async def acquire_lock(db: AsyncSession, user_id: UUID) -> UserLockResponse:
+async def claim_free_users(
+    db: AsyncSession,
+    count: int,
+    filters: UserFilter | None = None,
+    ttl: int | None = None,
+    selection: FreeUserSelection | None = None,
+    wait: float | None = None,
+) -> Sequence[User]:
     """
-    Наложить блокировку на пользователя.
-    Если пользователя нет → 404.
-    Если уже заблокирован → 409.
+    Атомарно найти и залочить до count свободных пользователей
+    в аренду на ttl секунд.
+
+    Как именно занимаются строки, решает бэкенд аренд (settings.lock_backend):
+    Postgres — UPDATE ... FOR UPDATE SKIP LOCKED RETURNING,
+    Redis — атомарный SET NX PX по ключам кандидатов.
+    Конкурентные клиенты не получают одних и тех же пользователей.
+    Все пользователи одного claim'а получают общий lease_token.
+    Порядок выбора — см. user_queries.ordered_candidates.
+    Если свободных меньше count — возвращаем сколько есть (возможно, ни одного);
+    с wait ждём, пока не освободится хотя бы один.
     """
-    stmt = select(User).where(User.id == user_id)
-    result = await db.execute(stmt)
-    user = result.scalar_one_or_none()
+    return await _wait_for_free(
+        db, filters, wait, lambda: _claim_free_users(db, count, filters, ttl, selection)
+    )
 
-    if user is None:
+
+async def _claim_free_users(
+    db: AsyncSession,
+    count: int,
+    filters: UserFilter | None,
+    ttl: int | None,
+    selection: FreeUserSelection | None,
+) -> list[User]:
+    users = await get_lock_backend().claim(db, count, filters, ttl, selection)
+    metrics.USERS_CLAIMED.inc(len(users))
+    return users
+
+
+async def claim_free_user(
+    db: AsyncSession,
+    filters: UserFilter | None = None,
+    ttl: int | None = None,
+    selection: FreeUserSelection | None = None,
+    wait: float | None = None,
+) -> User:
+    """
+    Атомарно найти и залочить одного свободного пользователя
+    (с теми же фильтрами, что и get_free_user).
+    Если свободных нет (и за wait секунд не появилось) — 404.
+    """
+    users = await claim_free_users(
+        db, count=1, filters=filters, ttl=ttl, selection=selection, wait=wait
+    )
+
+    if not users:
+        metrics.FREE_USERS_EXHAUSTED.inc()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found.",
+            detail="No free users available.",
         )
 
-    if user.locktime is not None:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="User is already locked.",
-        )
+    return users[0]
 
-    user.locktime = datetime.now(timezone.utc)
-    db.add(user)
-    await db.commit()
-    await db.refresh(user)
 
-    return UserLockResponse(
-        id=user.id,
-        locked=True,
-        locktime=user.locktime,
-        message="User successfully locked.",
-    )
+async def expire_stale_locks(db: AsyncSession) -> int:
+    """
+    Снять все lock'и с истёкшей арендой
+    (в Postgres-бэкенде — одним UPDATE по индексу на expires_at).
+    Возвращает количество освобождённых пользователей.
+    """
+    released = await get_lock_backend().expire_stale(db)
+    metrics.LOCKS_REAPED.inc(released)
+    return released
 
 
-async def release_lock(db: AsyncSession, user_id: UUID) -> UserLockResponse:
+async def acquire_lock(
+    db: AsyncSession,
+    user_id: UUID,
+    ttl: int | None = None,
+) -> UserLockResponse:
+    """
+    Наложить блокировку на пользователя (аренда на ttl секунд).
+    Если пользователя нет → 404.
+    Если уже заблокирован → 409.
+    """
+    return await get_lock_backend().acquire(db, user_id, ttl)
+
+
+async def renew_lock(
+    db: AsyncSession,
+    user_id: UUID,
+    lease_token: UUID,
+    ttl: int | None = None,
+) -> UserLockResponse:
+    """
+    Продлить аренду (heartbeat держателя lock'а) на ttl секунд от текущего момента.
+    Если пользователя нет → 404.
+    Если аренда чужая или уже истекла → 409.
+    """
+    return await get_lock_backend().renew(db, user_id, lease_token, ttl)
+
+
+def _require_lease_token(lease_token: UUID | None, force: bool) -> None:
+    """
+    Снимать аренду может только её держатель (lease_token);
+    без токена — только явный административный сброс force=True, иначе 400.
+    """
+    if lease_token is None and not force:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pass lease_token (or force=true for an administrative reset).",
+        )
+
+
+async def release_lock(
+    db: AsyncSession,
+    user_id: UUID,
+    lease_token: UUID | None = None,
+    force: bool = False,
+) -> UserLockResponse:
     """
     Снять блокировку с пользователя.
+    Без lease_token и без force → 400.
     Если пользователя нет → 404.
     Если не был заблокирован → просто сообщаем об этом.
+    Если аренда держится другим токеном → 409.
+    force=True без токена снимает аренду безусловно (административный сброс).
     """
-    stmt = select(User).where(User.id == user_id)
-    result = await db.execute(stmt)
-    user = result.scalar_one_or_none()
+    _require_lease_token(lease_token, force)
+    return await get_lock_backend().release(db, user_id, lease_token)
 
-    if user is None:
+
+def _unique_ids(user_ids: Sequence[UUID]) -> list[UUID]:
+    """Убрать дубли id, сохранив порядок; слишком длинный список — 400."""
+    if len(user_ids) > settings.bulk_lock_max:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found.",
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many user ids in one request (max {settings.bulk_lock_max}).",
         )
+    return list(dict.fromkeys(user_ids))
 
-    if user.locktime is None:
-        # не считаем это ошибкой, просто возвращаем статус
-        return UserLockResponse(
-            id=user.id,
-            locked=False,
-            locktime=None,
-            message="User was not locked.",
-        )
 
-    user.locktime = None
-    db.add(user)
-    await db.commit()
-    await db.refresh(user)
+async def acquire_locks(
+    db: AsyncSession,
+    user_ids: Sequence[UUID],
+    ttl: int | None = None,
+) -> list[UserLockOutcome]:
+    """
+    Массово залочить пользователей по id (аренда на ttl секунд, общий lease_token).
+    Одним set-based запросом; по каждому id — locked, already_locked или not_found.
+    """
+    outcomes = await get_lock_backend().acquire_many(db, _unique_ids(user_ids), ttl)
+    metrics.LOCK_CONFLICTS.inc(sum(o.status == "already_locked" for o in outcomes))
+    return outcomes
+
+
+async def release_locks(
+    db: AsyncSession,
+    user_ids: Sequence[UUID] | None = None,
+    filters: UserFilter | None = None,
+    lease_token: UUID | None = None,
+    force: bool = False,
+) -> list[UserLockOutcome]:
+    """
+    Массово снять блокировки — по списку id и/или по project_id/env/domain
+    (teardown прогона одним запросом).
+    Снимаются только аренды lease_token; без токена — только с force=True
+    (административный сброс), иначе 400.
+    Без id и без фильтров — 400: снимать всё подряд случайно не даём.
+    """
+    _require_lease_token(lease_token, force)
+    has_filters = filters is not None and any(
+        value is not None for value in (filters.project_id, filters.env, filters.domain)
+    )
+    if user_ids is None and not has_filters:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pass user ids or at least one of project_id/env/domain.",
+        )
 
-    return UserLockResponse(
-        id=user.id,
-        locked=False,
-        locktime=None,
-        message="User successfully unlocked.",
+    ids = _unique_ids(user_ids) if user_ids is not None else None
+    outcomes = await get_lock_backend().release_many(
+        db, ids, filters if has_filters else None, lease_token
     )
+    metrics.LOCK_CONFLICTS.inc(sum(o.status == "conflict" for o in outcomes))
+    return outcomes
 
 
 async def get_user_by_login(db: AsyncSession, login: str) -> User | None:
@@ -171,17 +550,32 @@ async def get_user_by_id(db: AsyncSession, user_id: UUID) -> User | None:
     return result.scalar_one_or_none()
 
 
+async def with_lease_state(db: AsyncSession, user: UserRead) -> UserRead:
+    """
+    Дополнить снимок пользователя из кэша авторизации или claims токена
+    текущим состоянием аренды: сами снимки его не хранят — locktime
+    меняется на каждом claim/release, а кэш у каждого воркера свой.
+    """
+    locktime, expires_at = await get_lock_backend().lease_state(db, user.id)
+    return user.model_copy(update={"locktime": locktime, "expires_at": expires_at})
+
+
 async def authenticate_user(db: AsyncSession, login: str, password: str) -> User | None:
     """
     Проверка логина и пароля:
     - находим пользователя по логину
-    - сверяем пароль через verify_password
+    - если эта пара логин/пароль недавно успешно проверялась — pbkdf2 пропускаем
+    - иначе сверяем пароль через verify_password_async (вне event loop)
     """
     user = await get_user_by_login(db, login=login)
     if user is None:
         return None
 
-    if not verify_password(password, user.password):
+    if auth_cache.is_verified(login, password, user.password):
+        return user
+
+    if not await verify_password_async(password, user.password):
         return None
 
+    auth_cache.remember_verified(login, password, user.password)
     return user
\ No newline at end of file
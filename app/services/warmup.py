@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import time
+
+from fastapi import FastAPI
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+from app.core.security import create_access_token, decode_access_token, get_hash_executor
+from app.schemas.user import user_row_adapter, user_rows_adapter
+
+logger = logging.getLogger(__name__)
+
+# итог последнего прогрева — для /health/diagnostics
+last_warmup: dict | None = None
+
+
+async def warm_pool(engine: AsyncEngine, connections: int) -> int:
+    """
+    Открыть connections соединений пула одновременно (SELECT 1 на каждом)
+    и вернуть их в пул — первые запросы не платят за установку соединения.
+    """
+
+    async def open_one():
+        conn = await engine.connect()
+        await conn.execute(text("SELECT 1"))
+        return conn
+
+    opened = await asyncio.gather(*(open_one() for _ in range(connections)), return_exceptions=True)
+    ok = [conn for conn in opened if not isinstance(conn, BaseException)]
+    for conn in ok:
+        await conn.close()
+
+    errors = [exc for exc in opened if isinstance(exc, BaseException)]
+    if errors:
+        raise errors[0]
+    return len(ok)
+
+
+def prime_app(app: FastAPI) -> None:
+    """
+    Прогреть то, что строится лениво на первом запросе:
+    OpenAPI-схему (/docs), сериализаторы строк, JWT и пул хеширования.
+    """
+    app.openapi()
+    user_rows_adapter.dump_json([])
+    user_row_adapter.json_schema()
+    decode_access_token(create_access_token("warmup"))
+    get_hash_executor()
+
+
+async def warm_up(app: FastAPI, engine: AsyncEngine) -> dict:
+    """
+    Прогрев воркера перед приёмом трафика (вызывается из lifespan до yield,
+    поэтому uvicorn не начнёт отвечать, а readiness — не станет true, пока он идёт).
+    Недоступная БД не роняет старт: ошибку логируем, readiness её и покажет.
+    """
+    global last_warmup
+    started = time.perf_counter()
+    result: dict = {"connections": 0, "error": None}
+
+    prime_app(app)
+    try:
+        result["connections"] = await asyncio.wait_for(
+            warm_pool(engine, settings.db_warmup_connections),
+            timeout=settings.warmup_timeout_seconds,
+        )
+    except Exception as exc:
+        result["error"] = str(exc) or type(exc).__name__
+        logger.warning("Connection pool warmup failed: %s", result["error"])
+
+    result["duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    last_warmup = result
+    return result
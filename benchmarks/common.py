@@ -0,0 +1,92 @@
+import json
+import math
+import platform
+import statistics
+import tempfile
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.db.base import Base
+
+
+def percentile(samples: list[float], q: float) -> float:
+    """Перцентиль q (0..100) по методу nearest-rank; samples уже отсортированы."""
+    if not samples:
+        return 0.0
+    rank = max(math.ceil(q / 100 * len(samples)), 1)
+    return samples[rank - 1]
+
+
+def summarize(samples: list[float]) -> dict:
+    """Сводка по задержкам в секундах → миллисекунды: count, mean, p50/p95/p99, max."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {"count": 0}
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def environment() -> dict:
+    """С чем снимались цифры — чтобы не сравнивать прогоны с разных машин вслепую."""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "node": platform.node(),
+    }
+
+
+def save_report(report: dict, path: str | Path) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n")
+
+
+def load_report(path: str | Path) -> dict:
+    return json.loads(Path(path).read_text())
+
+
+def compare_metrics(current: dict[str, float], baseline: dict[str, float]) -> list[str]:
+    """
+    Строки «метрика: было → стало (±%)» для метрик, которые есть в обоих прогонах.
+    Плоские словари: имя метрики → число.
+    """
+    lines = []
+    for name, value in current.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        delta = (value - before) / before * 100 if before else 0.0
+        lines.append(f"{name}: {before:g} -> {value:g} ({delta:+.1f}%)")
+    return lines
+
+
+@asynccontextmanager
+async def sqlite_session_factory(
+    path: str | None = None,
+) -> AsyncIterator[async_sessionmaker[AsyncSession]]:
+    """
+    Фабрика сессий на свежей SQLite-базе (файл во временной папке),
+    со схемой из моделей — как в tests/conftest.py.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite+aiosqlite:///{path or Path(tmp) / 'bench.db'}"
+        # конкурентные писатели ждут блокировку файла, а не падают сразу
+        engine = create_async_engine(url, connect_args={"timeout": 30})
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        try:
+            yield async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+        finally:
+            await engine.dispose()
@@ -0,0 +1,319 @@
+"""
+Нагрузочный прогон: N конкурентных ботов против сервиса.
+
+Каждый бот в цикле выполняет сценарии (веса задаются --mix):
+- cycle — взять пользователя (GET /free → POST /acquire, либо POST /free/claim
+  при --flow claim), подержать --hold-ms и отпустить с lease_token
+- login — POST /token
+- list — GET /users/ одной страницей
+
+Итог: пропускная способность, p50/p95/p99 по операциям, доля 409 на acquire,
+доля 404 на поиске свободного и число двойных выдач — когда один и тот же
+пользователь оказался одновременно у двух ботов (должно быть 0).
+
+In-process (через httpx ASGITransport, на временной SQLite):
+    python -m benchmarks.load --bots 50 --duration 10
+Против запущенного сервера:
+    python -m benchmarks.load --url http://localhost:8000 --bots 50
+Baseline:
+    python -m benchmarks.load --save benchmarks/baselines/load.json
+    python -m benchmarks.load --compare benchmarks/baselines/load.json
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+import httpx
+
+from benchmarks.common import (
+    compare_metrics,
+    environment,
+    load_report,
+    save_report,
+    sqlite_session_factory,
+    summarize,
+)
+
+API = "/api/v1"
+PASSWORD = "bench-secret"
+
+
+@dataclass
+class LoadConfig:
+    bots: int = 20
+    users: int = 50
+    duration: float = 10.0
+    hold_ms: float = 5.0
+    flow: str = "free-acquire"  # или claim
+    mix: dict[str, int] = field(default_factory=lambda: {"cycle": 8, "login": 1, "list": 1})
+    seed: int | None = None
+
+
+@dataclass
+class LoadStats:
+    latencies: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    statuses: dict[str, Counter] = field(default_factory=lambda: defaultdict(Counter))
+    # кто из ботов сейчас держит пользователя — по мнению самих ботов
+    holders: dict[str, int] = field(default_factory=dict)
+    double_assignments: int = 0
+
+    async def call(self, op: str, request) -> httpx.Response | None:
+        started = time.perf_counter()
+        try:
+            response = await request
+        except httpx.HTTPError:
+            self.statuses[op]["error"] += 1
+            return None
+        self.latencies[op].append(time.perf_counter() - started)
+        self.statuses[op][str(response.status_code)] += 1
+        return response
+
+    def hold(self, bot: int, user_id: str) -> None:
+        if user_id in self.holders:
+            self.double_assignments += 1
+        self.holders[user_id] = bot
+
+    def drop(self, bot: int, user_id: str) -> None:
+        if self.holders.get(user_id) == bot:
+            del self.holders[user_id]
+
+
+def _rate(counter: Counter, status: str) -> float:
+    total = sum(counter.values())
+    return round(counter[status] / total, 4) if total else 0.0
+
+
+@asynccontextmanager
+async def in_process_client() -> AsyncIterator[httpx.AsyncClient]:
+    """Клиент к приложению в этом же процессе, БД — временная SQLite."""
+    from app.db.session import get_db
+    from app.main import app
+
+    async with sqlite_session_factory() as session_factory:
+        async def get_bench_db():
+            async with session_factory() as session:
+                yield session
+
+        previous = app.dependency_overrides.get(get_db)
+        app.dependency_overrides[get_db] = get_bench_db
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                yield client
+        finally:
+            if previous is None:
+                app.dependency_overrides.pop(get_db, None)
+            else:
+                app.dependency_overrides[get_db] = previous
+
+
+async def seed_users(client: httpx.AsyncClient, count: int, project_id: str) -> list[str]:
+    """Создать пул пользователей отдельного проекта (не мешаем чужим данным)."""
+    payload = [
+        {
+            "login": f"bench_{project_id[:8]}_{i}@example.com",
+            "password": PASSWORD,
+            "project_id": project_id,
+            "env": "bench",
+            "domain": "regular",
+        }
+        for i in range(count)
+    ]
+    response = await client.post(f"{API}/users/bulk", json=payload, timeout=120)
+    response.raise_for_status()
+    return [user["login"] for user in payload]
+
+
+async def _cycle(client, stats: LoadStats, config: LoadConfig, bot: int, filters: dict) -> None:
+    if config.flow == "claim":
+        response = await stats.call("claim", client.post(f"{API}/users/free/claim", params=filters))
+        if response is None or response.status_code != 200:
+            return
+        lease = response.json()
+    else:
+        response = await stats.call("free", client.get(f"{API}/users/free", params=filters))
+        if response is None or response.status_code != 200:
+            return
+        user_id = response.json()["id"]
+        response = await stats.call("acquire", client.post(f"{API}/users/{user_id}/acquire"))
+        if response is None or response.status_code != 200:
+            return
+        lease = response.json()
+
+    user_id = lease["id"]
+    stats.hold(bot, user_id)
+    await asyncio.sleep(config.hold_ms / 1000)
+    # снимаем отметку до запроса: после ответа пользователя уже может взять другой бот
+    stats.drop(bot, user_id)
+    await stats.call(
+        "release",
+        client.post(
+            f"{API}/users/{user_id}/release",
+            params={"lease_token": lease["lease_token"]},
+        ),
+    )
+
+
+async def _bot(client, stats, config, bot, deadline, logins, filters, rng) -> None:
+    scenarios = list(config.mix)
+    weights = [config.mix[name] for name in scenarios]
+    loop = asyncio.get_running_loop()
+
+    while loop.time() < deadline:
+        scenario = rng.choices(scenarios, weights)[0]
+        if scenario == "cycle":
+            await _cycle(client, stats, config, bot, filters)
+        elif scenario == "login":
+            await stats.call(
+                "login",
+                client.post(
+                    f"{API}/token",
+                    data={"username": rng.choice(logins), "password": PASSWORD},
+                ),
+            )
+        elif scenario == "list":
+            await stats.call("list", client.get(f"{API}/users/", params={**filters, "limit": 50}))
+
+
+async def run_load(client: httpx.AsyncClient, config: LoadConfig) -> dict:
+    """Засеять пул пользователей, прогнать ботов config.duration секунд, собрать отчёт."""
+    project_id = str(uuid.uuid4())
+    logins = await seed_users(client, config.users, project_id)
+    filters = {"project_id": project_id, "env": "bench"}
+
+    stats = LoadStats()
+    rng = random.Random(config.seed)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    deadline = started + config.duration
+
+    await asyncio.gather(
+        *(
+            _bot(client, stats, config, bot, deadline, logins, filters, random.Random(rng.random()))
+            for bot in range(config.bots)
+        )
+    )
+    elapsed = loop.time() - started
+
+    total = sum(sum(counter.values()) for counter in stats.statuses.values())
+    acquires = stats.statuses["claim" if config.flow == "claim" else "acquire"]
+    lookups = stats.statuses["claim" if config.flow == "claim" else "free"]
+
+    return {
+        "environment": environment(),
+        "config": {
+            "bots": config.bots,
+            "users": config.users,
+            "duration_s": config.duration,
+            "hold_ms": config.hold_ms,
+            "flow": config.flow,
+            "mix": config.mix,
+        },
+        "elapsed_s": round(elapsed, 3),
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "conflict_rate": _rate(acquires, "409"),
+        "not_found_rate": _rate(lookups, "404"),
+        "double_assignments": stats.double_assignments,
+        "operations": {
+            op: {**summarize(stats.latencies[op]), "statuses": dict(counter)}
+            for op, counter in sorted(stats.statuses.items())
+        },
+    }
+
+
+def flat_metrics(report: dict) -> dict[str, float]:
+    """Метрики отчёта для сравнения с baseline."""
+    metrics = {
+        "throughput_rps": report["throughput_rps"],
+        "conflict_rate": report["conflict_rate"],
+        "not_found_rate": report["not_found_rate"],
+    }
+    for op, summary in report["operations"].items():
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if key in summary:
+                metrics[f"{op}.{key}"] = summary[key]
+    return metrics
+
+
+def _parse_mix(value: str) -> dict[str, int]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = int(weight or 1)
+    unknown = set(mix) - {"cycle", "login", "list"}
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def _print_report(report: dict) -> None:
+    print(
+        f"{report['requests']} requests in {report['elapsed_s']}s "
+        f"({report['throughput_rps']} req/s), "
+        f"conflicts {report['conflict_rate']:.1%}, not found {report['not_found_rate']:.1%}, "
+        f"double assignments {report['double_assignments']}"
+    )
+    for op, summary in report["operations"].items():
+        print(
+            f"  {op:<8} n={summary.get('count', 0):<6} "
+            f"p50={summary.get('p50_ms', 0):>8}ms p95={summary.get('p95_ms', 0):>8}ms "
+            f"p99={summary.get('p99_ms', 0):>8}ms  {summary['statuses']}"
+        )
+
+
+async def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="адрес запущенного сервиса; без него — in-process ASGI")
+    parser.add_argument("--bots", type=int, default=LoadConfig.bots)
+    parser.add_argument("--users", type=int, default=LoadConfig.users)
+    parser.add_argument("--duration", type=float, default=LoadConfig.duration)
+    parser.add_argument("--hold-ms", type=float, default=LoadConfig.hold_ms)
+    parser.add_argument("--flow", choices=["free-acquire", "claim"], default=LoadConfig.flow)
+    parser.add_argument("--mix", type=_parse_mix, default=None, help="например cycle=8,login=1,list=1")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--save", help="сохранить отчёт (JSON) как baseline")
+    parser.add_argument("--compare", help="сравнить с сохранённым отчётом")
+    args = parser.parse_args(argv)
+
+    config = LoadConfig(
+        bots=args.bots,
+        users=args.users,
+        duration=args.duration,
+        hold_ms=args.hold_ms,
+        flow=args.flow,
+        seed=args.seed,
+    )
+    if args.mix:
+        config.mix = args.mix
+
+    if args.url:
+        limits = httpx.Limits(max_connections=args.bots * 2)
+        async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=30) as client:
+            report = await run_load(client, config)
+    else:
+        async with in_process_client() as client:
+            report = await run_load(client, config)
+    report["mode"] = "http" if args.url else "asgi"
+
+    _print_report(report)
+    if args.compare:
+        print(f"vs {args.compare}:")
+        for line in compare_metrics(flat_metrics(report), flat_metrics(load_report(args.compare))):
+            print(f"  {line}")
+    if args.save:
+        save_report(report, args.save)
+
+    return 1 if report["double_assignments"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
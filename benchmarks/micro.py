@@ -0,0 +1,348 @@
+"""
+Микробенчмарки горячих путей: пароли, JWT, сериализация UserRead
+и функции user_service на SQLite.
+
+Каждый кейс калибруется (число вызовов в серии — чтобы серия шла не меньше
+--min-time), затем прогоняется --repeat серий с выключенным GC.
+В отчёте — время одного вызова в микросекундах: медиана, минимум,
+межквартильный размах и стандартное отклонение по сериям.
+
+    python -m benchmarks.micro
+    python -m benchmarks.micro --filter security. --json /tmp/micro.json
+    python -m benchmarks.micro --compare benchmarks/baselines/micro.json
+"""
+
+import argparse
+import asyncio
+import gc
+import re
+import statistics
+import sys
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timezone
+from itertools import count
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.security import (
+    create_access_token,
+    decode_access_token,
+    hash_password,
+    verify_password,
+)
+from app.models.user import User
+from app.schemas.user import UserCreate, UserRead, user_rows_adapter
+from app.services import auth_cache, user_service
+from app.services.user_queries import READ_COLUMNS
+from benchmarks.common import (
+    compare_metrics,
+    environment,
+    load_report,
+    save_report,
+    sqlite_session_factory,
+)
+
+PASSWORD = "bench-secret"
+PROJECT_ID = uuid.UUID("00000000-0000-4000-8000-00000000b0b0")
+
+Bench = Callable[[], Awaitable[None]]
+
+
+def _stats(per_call: list[float]) -> dict:
+    ordered = sorted(per_call)
+    q1, _, q3 = statistics.quantiles(ordered, n=4) if len(ordered) > 1 else (ordered[0],) * 3
+    to_us = 1_000_000
+    return {
+        "median_us": round(statistics.median(ordered) * to_us, 3),
+        "min_us": round(ordered[0] * to_us, 3),
+        "iqr_us": round((q3 - q1) * to_us, 3),
+        "stdev_us": round(statistics.pstdev(ordered) * to_us, 3),
+    }
+
+
+async def _run_series(fn: Bench, number: int) -> float:
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        for _ in range(number):
+            await fn()
+        return time.perf_counter() - started
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+async def measure(fn: Bench, repeat: int, min_time: float) -> dict:
+    """Прогрев + калибровка числа вызовов в серии, затем repeat серий."""
+    await fn()
+    number = 1
+    while (elapsed := await _run_series(fn, number)) < min_time:
+        number *= 2 if elapsed < min_time / 10 else max(2, int(min_time / elapsed) + 1)
+
+    per_call = [await _run_series(fn, number) / number for _ in range(repeat)]
+    return {"number": number, "repeat": repeat, **_stats(per_call)}
+
+
+def security_cases() -> dict[str, Bench]:
+    password_hash = hash_password(PASSWORD)
+    subject = str(uuid.uuid4())
+    token = create_access_token(subject)
+
+    async def hash_():
+        hash_password(PASSWORD)
+
+    async def verify():
+        verify_password(PASSWORD, password_hash)
+
+    async def create_token():
+        create_access_token(subject)
+
+    async def decode_token():
+        decode_access_token(token)
+
+    return {
+        "security.hash_password": hash_,
+        "security.verify_password": verify,
+        "security.create_access_token": create_token,
+        "security.decode_access_token": decode_token,
+    }
+
+
+async def seed(session_factory: async_sessionmaker[AsyncSession], users: int) -> None:
+    """Пул пользователей одним INSERT'ом; хеш пароля один на всех — pbkdf2 здесь не меряем."""
+    password_hash = hash_password(PASSWORD)
+    now = datetime.now(timezone.utc)
+    rows = [
+        {
+            "id": uuid.uuid4(),
+            "created_at": now,
+            "last_used_at": now,
+            "login": f"micro_{i}@example.com",
+            "password": password_hash,
+            "project_id": PROJECT_ID,
+            "env": "bench",
+            "domain": "regular",
+        }
+        for i in range(users)
+    ]
+    async with session_factory() as db:
+        await db.execute(insert(User), rows)
+        await db.commit()
+
+
+async def serialization_cases(
+    session_factory: async_sessionmaker[AsyncSession],
+    rows: int,
+) -> dict[str, Bench]:
+    async with session_factory() as db:
+        result = await db.execute(select(User).limit(rows))
+        users = result.scalars().all()
+        result = await db.execute(select(*READ_COLUMNS).limit(rows))
+        read_rows = [dict(row) for row in result.mappings()]
+
+    async def validate():
+        [UserRead.model_validate(user) for user in users]
+
+    snapshots = [UserRead.model_validate(user) for user in users]
+
+    async def dump_json():
+        [snapshot.model_dump_json() for snapshot in snapshots]
+
+    async def rows_dump_json():
+        user_rows_adapter.dump_json(read_rows)
+
+    return {
+        f"serialization.user_read_validate_{len(users)}": validate,
+        f"serialization.user_read_dump_json_{len(users)}": dump_json,
+        f"serialization.user_rows_dump_json_{len(read_rows)}": rows_dump_json,
+    }
+
+
+def service_cases(
+    session_factory: async_sessionmaker[AsyncSession],
+) -> tuple[dict[str, Bench], Bench]:
+    """
+    Функции user_service; на каждый вызов — своя сессия, как на запрос.
+    Возвращает кейсы и prepare() — его вызвать после seed().
+    """
+    numbers = count()
+    state: dict = {}
+
+    async def create_user():
+        async with session_factory() as db:
+            user_in = UserCreate(
+                login=f"micro_new_{next(numbers)}@example.com",
+                password=PASSWORD,
+                project_id=PROJECT_ID,
+                env="bench-new",
+                domain="regular",
+            )
+            await user_service.create_user(db, user_in)
+
+    async def create_users_bulk():
+        async with session_factory() as db:
+            users_in = [
+                UserCreate(
+                    login=f"micro_bulk_{next(numbers)}@example.com",
+                    password=PASSWORD,
+                    project_id=PROJECT_ID,
+                    env="bench-new",
+                    domain="regular",
+                )
+                for _ in range(10)
+            ]
+            await user_service.create_users_bulk(db, users_in)
+
+    async def get_users():
+        async with session_factory() as db:
+            await user_service.get_users(db, limit=100)
+
+    async def get_pool_stats():
+        user_service._stats_cache.clear()
+        async with session_factory() as db:
+            await user_service.get_pool_stats(db)
+
+    async def get_pool_stats_cached():
+        async with session_factory() as db:
+            await user_service.get_pool_stats(db)
+
+    async def get_free_user():
+        async with session_factory() as db:
+            await user_service.get_free_user(db)
+
+    async def claim_release():
+        async with session_factory() as db:
+            user = await user_service.claim_free_user(db)
+            await user_service.release_lock(db, user.id, user.lease_token)
+
+    async def claim_batch_release():
+        async with session_factory() as db:
+            users = await user_service.claim_free_users(db, count=10)
+            for user in users:
+                await user_service.release_lock(db, user.id, user.lease_token)
+
+    async def acquire_release():
+        async with session_factory() as db:
+            user_id = state["user_id"]
+            lease = await user_service.acquire_lock(db, user_id)
+            await user_service.release_lock(db, user_id, lease.lease_token)
+
+    async def renew():
+        async with session_factory() as db:
+            if "lease_token" not in state:
+                lock = await user_service.acquire_lock(db, state["renew_user_id"])
+                state["lease_token"] = lock.lease_token
+            await user_service.renew_lock(db, state["renew_user_id"], state["lease_token"])
+
+    async def expire_stale_locks():
+        async with session_factory() as db:
+            await user_service.expire_stale_locks(db)
+
+    async def get_user_by_login():
+        async with session_factory() as db:
+            await user_service.get_user_by_login(db, "micro_0@example.com")
+
+    async def get_user_by_id():
+        async with session_factory() as db:
+            await user_service.get_user_by_id(db, state["user_id"])
+
+    async def authenticate_user():
+        auth_cache.credential_cache.clear()
+        async with session_factory() as db:
+            await user_service.authenticate_user(db, "micro_0@example.com", PASSWORD)
+
+    async def authenticate_user_cached():
+        async with session_factory() as db:
+            await user_service.authenticate_user(db, "micro_0@example.com", PASSWORD)
+
+    async def prepare():
+        async with session_factory() as db:
+            result = await db.execute(select(User.id).order_by(User.created_at).limit(2))
+            state["user_id"], state["renew_user_id"] = result.scalars().all()
+
+    cases = {
+        "service.create_user": create_user,
+        "service.create_users_bulk_10": create_users_bulk,
+        "service.get_users_100": get_users,
+        "service.get_pool_stats": get_pool_stats,
+        "service.get_pool_stats_cached": get_pool_stats_cached,
+        "service.get_free_user": get_free_user,
+        "service.claim_free_user+release_lock": claim_release,
+        "service.claim_free_users_10+release_lock": claim_batch_release,
+        "service.acquire_lock+release_lock": acquire_release,
+        "service.renew_lock": renew,
+        "service.expire_stale_locks": expire_stale_locks,
+        "service.get_user_by_login": get_user_by_login,
+        "service.get_user_by_id": get_user_by_id,
+        "service.authenticate_user": authenticate_user,
+        "service.authenticate_user_cached": authenticate_user_cached,
+    }
+    return cases, prepare
+
+
+async def run(
+    pattern: str | None = None,
+    repeat: int = 5,
+    min_time: float = 0.2,
+    users: int = 1000,
+) -> dict:
+    """Прогнать кейсы, имя которых подходит под regex pattern; вернуть отчёт."""
+    selected = re.compile(pattern) if pattern else None
+    results: dict[str, dict] = {}
+
+    async def measure_all(cases: dict[str, Bench]) -> None:
+        for name, fn in cases.items():
+            if selected is not None and not selected.search(name):
+                continue
+            results[name] = await measure(fn, repeat, min_time)
+            print(f"{name:<45} {results[name]['median_us']:>12.1f} us  ±{results[name]['iqr_us']:.1f}")
+
+    await measure_all(security_cases())
+
+    async with sqlite_session_factory() as session_factory:
+        await seed(session_factory, users)
+        await measure_all(await serialization_cases(session_factory, users))
+
+        cases, prepare = service_cases(session_factory)
+        await prepare()
+        await measure_all(cases)
+
+    return {
+        "environment": environment(),
+        "config": {"repeat": repeat, "min_time_s": min_time, "users": users},
+        "results": results,
+    }
+
+
+async def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", help="regex по имени кейса, например ^service\\.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="минимальная длительность серии, сек")
+    parser.add_argument("--users", type=int, default=1000, help="размер пула пользователей в SQLite")
+    parser.add_argument("--json", help="записать отчёт в JSON")
+    parser.add_argument("--compare", help="сравнить медианы с сохранённым отчётом")
+    args = parser.parse_args(argv)
+
+    report = await run(args.filter, args.repeat, args.min_time, args.users)
+
+    if args.compare:
+        baseline = load_report(args.compare)["results"]
+        print(f"vs {args.compare}:")
+        for line in compare_metrics(
+            {name: result["median_us"] for name, result in report["results"].items()},
+            {name: result["median_us"] for name, result in baseline.items()},
+        ):
+            print(f"  {line}")
+    if args.json:
+        save_report(report, args.json)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
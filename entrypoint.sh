@@ -1,8 +1,8 @@
 #!/bin/sh
 set -e
 
-echo "👉 Applying database migrations..."
-alembic upgrade head
+echo "👉 Checking database migrations..."
+python -m app.db.migrate
 
-echo "✅ Migrations applied, starting app..."
-exec uvicorn app.main:app --host 0.0.0.0 --port 8000
+echo "✅ Schema is up to date, starting app..."
+exec python -m app.server
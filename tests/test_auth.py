@@ -3,6 +3,9 @@ import uuid
 import pytest
 from httpx import AsyncClient
 
+from app.core.config import settings
+from app.services.auth_cache import credential_cache, invalidate_user, user_cache
+
 
 @pytest.mark.asyncio
 async def test_get_token_success(
@@ -82,3 +85,134 @@ async def test_get_token_invalid_password(
     assert token_resp.status_code == 401
     body = token_resp.json()
     assert body["detail"] == "Incorrect login or password"
+
+
+@pytest.mark.asyncio
+async def test_token_credentials_cache(
+    client: AsyncClient,
+    prepare_database,
+) -> None:
+    """
+    Повторный логин с тем же паролем обслуживается из кэша проверок,
+    а неверный пароль по-прежнему даёт 401.
+    """
+    password = "MySecret123!"
+    payload = {
+        "login": "auth_cache@example.com",
+        "password": password,
+        "project_id": str(uuid.uuid4()),
+        "env": "prod",
+        "domain": "regular",
+    }
+    create_resp = await client.post("/api/v1/users/", json=payload)
+    assert create_resp.status_code == 201
+
+    form = {
+        "username": payload["login"],
+        "password": password,
+        "grant_type": "password",
+    }
+    assert (await client.post("/api/v1/token", data=form)).status_code == 200
+
+    hits_before = credential_cache.hits
+    assert (await client.post("/api/v1/token", data=form)).status_code == 200
+    assert credential_cache.hits == hits_before + 1
+
+    bad_form = dict(form, password="WrongPassword!")
+    assert (await client.post("/api/v1/token", data=bad_form)).status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_current_user_served_from_cache(
+    client: AsyncClient,
+    prepare_database,
+) -> None:
+    """
+    /users/me:
+    - первый запрос берёт пользователя из БД и кладёт в кэш
+    - повторный отдаётся из кэша
+    - после invalidate_user снова идёт в БД
+    """
+    password = "MySecret123!"
+    payload = {
+        "login": "auth_me@example.com",
+        "password": password,
+        "project_id": str(uuid.uuid4()),
+        "env": "prod",
+        "domain": "regular",
+    }
+    create_resp = await client.post("/api/v1/users/", json=payload)
+    assert create_resp.status_code == 201
+    user_id = uuid.UUID(create_resp.json()["id"])
+
+    token_resp = await client.post(
+        "/api/v1/token",
+        data={
+            "username": payload["login"],
+            "password": password,
+            "grant_type": "password",
+        },
+    )
+    headers = {"Authorization": f"Bearer {token_resp.json()['access_token']}"}
+
+    me_1 = await client.get("/api/v1/users/me", headers=headers)
+    assert me_1.status_code == 200
+    assert me_1.json()["login"] == payload["login"]
+
+    hits_before = user_cache.hits
+    me_2 = await client.get("/api/v1/users/me", headers=headers)
+    assert me_2.status_code == 200
+    assert user_cache.hits == hits_before + 1
+
+    invalidate_user(user_id)
+    assert user_cache.get(user_id) is None
+
+    me_3 = await client.get("/api/v1/users/me", headers=headers)
+    assert me_3.status_code == 200
+    assert me_3.json()["id"] == str(user_id)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("stateless", [False, True])
+async def test_current_user_reflects_lease(
+    client: AsyncClient,
+    prepare_database,
+    monkeypatch,
+    stateless: bool,
+) -> None:
+    """
+    /users/me показывает текущую аренду, хотя снимок пользователя
+    закэширован (или собран из claims токена) до acquire, и снова
+    locktime=None после release.
+    """
+    monkeypatch.setattr(settings, "auth_stateless", stateless)
+    password = "MySecret123!"
+    payload = {
+        "login": f"auth_lease_{stateless}@example.com",
+        "password": password,
+        "project_id": str(uuid.uuid4()),
+        "env": "prod",
+        "domain": "regular",
+    }
+    create_resp = await client.post("/api/v1/users/", json=payload)
+    user_id = create_resp.json()["id"]
+    token_resp = await client.post(
+        "/api/v1/token",
+        data={"username": payload["login"], "password": password, "grant_type": "password"},
+    )
+    headers = {"Authorization": f"Bearer {token_resp.json()['access_token']}"}
+
+    me_before = await client.get("/api/v1/users/me", headers=headers)
+    assert me_before.json()["locktime"] is None
+
+    lease = (await client.post(f"/api/v1/users/{user_id}/acquire")).json()
+    me_locked = (await client.get("/api/v1/users/me", headers=headers)).json()
+    assert me_locked["locktime"] == lease["locktime"]
+    assert me_locked["expires_at"] == lease["expires_at"]
+
+    await client.post(
+        f"/api/v1/users/{user_id}/release", params={"lease_token": lease["lease_token"]}
+    )
+    me_released = (await client.get("/api/v1/users/me", headers=headers)).json()
+    assert me_released["locktime"] is None
+    assert me_released["expires_at"] is None
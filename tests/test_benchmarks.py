@@ -0,0 +1,49 @@
+import pytest
+
+from benchmarks import micro
+from benchmarks.load import LoadConfig, flat_metrics, in_process_client, run_load
+
+
+@pytest.mark.asyncio
+async def test_load_harness_claim_flow() -> None:
+    """
+    Короткий прогон нагрузочного харнесса in-process:
+    отчёт собирается, двойных выдач пользователей нет.
+    """
+    config = LoadConfig(bots=5, users=5, duration=0.5, hold_ms=1, flow="claim", seed=1)
+
+    async with in_process_client() as client:
+        report = await run_load(client, config)
+
+    assert report["requests"] > 0
+    assert report["double_assignments"] == 0
+    assert report["operations"]["claim"]["statuses"].get("200", 0) > 0
+    assert "claim.p99_ms" in flat_metrics(report)
+
+
+@pytest.mark.asyncio
+async def test_load_harness_free_acquire_has_no_double_assignments() -> None:
+    """free → acquire под конкуренцией: 409 бывают, двойных выдач — нет."""
+    config = LoadConfig(bots=10, users=3, duration=0.5, hold_ms=1, mix={"cycle": 1}, seed=1)
+
+    async with in_process_client() as client:
+        report = await run_load(client, config)
+
+    assert report["operations"]["acquire"]["statuses"].get("200", 0) > 0
+    assert report["double_assignments"] == 0
+
+
+@pytest.mark.asyncio
+async def test_micro_benchmarks_report() -> None:
+    """Микробенчмарки по фильтру: в отчёте только выбранные кейсы со статистикой."""
+    report = await micro.run(
+        pattern=r"^(security\.create_access_token|service\.get_user_by_id)$",
+        repeat=2,
+        min_time=0.001,
+        users=10,
+    )
+
+    assert set(report["results"]) == {"security.create_access_token", "service.get_user_by_id"}
+    for result in report["results"].values():
+        assert result["median_us"] > 0
+        assert result["min_us"] <= result["median_us"]
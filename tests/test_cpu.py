@@ -0,0 +1,36 @@
+from pathlib import Path
+
+from app.core.cpu import available_cpus, cgroup_cpu_limit
+
+
+def _write(root: Path, name: str, value: str) -> None:
+    path = root / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(value + "\n")
+
+
+def test_cgroup_v2_cpu_limit(tmp_path: Path) -> None:
+    """cgroup v2: cpu.max с квотой и без неё."""
+    _write(tmp_path, "cpu.max", "150000 100000")
+    assert cgroup_cpu_limit(tmp_path) == 1.5
+
+    _write(tmp_path, "cpu.max", "max 100000")
+    assert cgroup_cpu_limit(tmp_path) is None
+
+
+def test_cgroup_v1_cpu_limit(tmp_path: Path) -> None:
+    """cgroup v1: cfs_quota_us / cfs_period_us, -1 — квоты нет."""
+    _write(tmp_path, "cpu/cpu.cfs_period_us", "100000")
+    _write(tmp_path, "cpu/cpu.cfs_quota_us", "-1")
+    assert cgroup_cpu_limit(tmp_path) is None
+
+    _write(tmp_path, "cpu/cpu.cfs_quota_us", "50000")
+    assert cgroup_cpu_limit(tmp_path) == 0.5
+
+
+def test_available_cpus_respects_quota(tmp_path: Path) -> None:
+    """Воркеров не больше квоты (дробная квота округляется вверх), но хотя бы один."""
+    assert available_cpus(tmp_path) >= 1
+
+    _write(tmp_path, "cpu.max", "50000 100000")
+    assert available_cpus(tmp_path) == 1
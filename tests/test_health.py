@@ -1,5 +1,16 @@
+import uuid
+
 import pytest
+from fastapi.routing import APIRoute
 from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.config import settings
+from app.core.metrics import _route_template
+from app.main import app
+from app.services import warmup
+from app.services.health_checker import health_checker
+from tests.conftest import AsyncSessionLocalTest, engine_test
 
 
 @pytest.mark.asyncio
@@ -26,3 +37,110 @@ async def test_health_ok(client: AsyncClient, prepare_database):
     assert "db" in data
     assert isinstance(data["db"], dict)
     assert data["db"]["status"] == "ok"
+
+
+@pytest.mark.asyncio
+async def test_pool_status(client: AsyncClient):
+    """
+    /api/v1/health/pool отдаёт статистику пула без обращения к БД.
+    """
+    resp = await client.get("/api/v1/health/pool")
+    assert resp.status_code == 200
+
+    data = resp.json()
+    for key in ("size", "checked_in", "checked_out", "overflow", "wait_seconds_max"):
+        assert key in data
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(client: AsyncClient, prepare_database):
+    """
+    /metrics отдаёт метрики Prometheus: латентность роутов по шаблону пути
+    и доменные счётчики.
+    """
+    resp_free = await client.get("/api/v1/users/free")
+    assert resp_free.status_code == 404
+
+    resp_acquire = await client.post(f"/api/v1/users/{uuid.uuid4()}/acquire")
+    assert resp_acquire.status_code == 404
+
+    resp = await client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+
+    body = resp.text
+    assert 'route="/api/v1/users/free"' in body
+    assert 'route="/api/v1/users/{user_id}/acquire"' in body
+    assert "botofarm_free_users_not_found_total" in body
+    assert "botofarm_db_pool_connections" in body
+
+
+def test_route_template_uses_matched_route() -> None:
+    """
+    Label route — шаблон совпавшего роута, даже если значение
+    path-параметра встречается в пути раньше самого параметра.
+    """
+    route = APIRoute("/{user_id}/acquire", lambda user_id: None)
+    scope = {
+        "path": "/api/v1/users/users/acquire",
+        "path_params": {"user_id": "users"},
+        "route": route,
+    }
+    # роут без префикса роутера (вложенный include_router)
+    assert _route_template(scope) == "/api/v1/users/{user_id}/acquire"
+
+    route = APIRoute("/api/v1/users/{user_id}/acquire", lambda user_id: None)
+    assert _route_template({**scope, "route": route}) == "/api/v1/users/{user_id}/acquire"
+    assert _route_template({"path": "/nope"}) == "unmatched"
+
+
+@pytest.mark.asyncio
+async def test_ready_served_from_background_check(
+    client: AsyncClient,
+    prepare_database,
+    monkeypatch,
+):
+    """
+    Если фоновая проверка уже отработала, /health/ready отвечает
+    из её результата (с возрастом), а /health/diagnostics показывает
+    БД, пул и event loop.
+    """
+    monkeypatch.setattr(health_checker, "session_factory", AsyncSessionLocalTest)
+    monkeypatch.setattr(health_checker, "state", None)
+
+    await health_checker.check_once()
+
+    resp = await client.get("/api/v1/health/ready")
+    assert resp.status_code == 200
+
+    db = resp.json()["db"]
+    assert db["status"] == "ok"
+    assert db["stale"] is False
+    assert "age_seconds" in db
+
+    diag = await client.get("/api/v1/health/diagnostics")
+    assert diag.status_code == 200
+    data = diag.json()
+    assert data["db"]["status"] == "ok"
+    assert "checked_out" in data["pool"]
+    assert "lag_seconds" in data["loop"]
+
+
+@pytest.mark.asyncio
+async def test_startup_warmup(client: AsyncClient, prepare_database):
+    """
+    Прогрев на старте открывает соединения пула и попадает в диагностику;
+    недоступная БД старт не роняет, а фиксируется как ошибка прогрева.
+    """
+    result = await warmup.warm_up(app, engine_test)
+    assert result["error"] is None
+    assert result["connections"] == settings.db_warmup_connections
+
+    resp = await client.get("/api/v1/health/diagnostics")
+    assert resp.json()["warmup"]["connections"] == settings.db_warmup_connections
+
+    broken = create_async_engine("sqlite+aiosqlite:////nonexistent/dir/warmup.db")
+    result = await warmup.warm_up(app, broken)
+    assert result["connections"] == 0
+    assert result["error"]
+    await broken.dispose()
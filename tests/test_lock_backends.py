@@ -0,0 +1,328 @@
+import asyncio
+import uuid
+from uuid import UUID
+
+import fakeredis
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.models.user import User
+from app.services import lock_backends, lock_events
+from app.services.lock_backends.redis import RedisLockBackend
+from app.services.user_service import _stats_cache
+from tests.conftest import AsyncSessionLocalTest
+
+
+@pytest.fixture
+def redis_backend(monkeypatch):
+    """Подменяем бэкенд аренд на Redis поверх in-process fakeredis."""
+    backend = RedisLockBackend(fakeredis.FakeAsyncRedis(decode_responses=True))
+    monkeypatch.setattr(lock_backends, "_backend", backend)
+    return backend
+
+
+async def _create_users(client: AsyncClient, count: int) -> list[str]:
+    project_id = str(uuid.uuid4())
+    ids = []
+    for i in range(count):
+        payload = {
+            "login": f"redis_{i}_{uuid.uuid4().hex[:6]}@example.com",
+            "password": "secret123",
+            "project_id": project_id,
+            "env": "prod",
+            "domain": "regular",
+        }
+        resp = await client.post("/api/v1/users/", json=payload)
+        assert resp.status_code == 201
+        ids.append(resp.json()["id"])
+    return ids
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_claim(
+    client: AsyncClient,
+    prepare_database,
+    redis_backend,
+) -> None:
+    """
+    Проверяем Redis-бэкенд:
+    - claim занимает пользователей ключами с TTL и общим lease_token
+    - занятые не выдаются повторно, а строки users не меняются
+    """
+    ids = await _create_users(client, 3)
+    async with AsyncSessionLocalTest() as db:
+        result = await db.execute(select(User.id, User.last_used_at).where(User.id.in_([UUID(i) for i in ids])))
+        last_used = dict(result.all())
+
+    resp = await client.post("/api/v1/users/claim", params={"count": 2, "ttl": 30})
+    assert resp.status_code == 200
+    leases = resp.json()
+    assert len(leases) == 2
+    assert len({lease["lease_token"] for lease in leases}) == 1
+    assert all(lease["expires_at"] is not None for lease in leases)
+
+    ttl_ms = await redis_backend.client.pttl(redis_backend._key(leases[0]["id"]))
+    assert 0 < ttl_ms <= 30_000
+
+    resp_free = await client.get("/api/v1/users/free")
+    assert resp_free.status_code == 200
+    last_id = resp_free.json()["id"]
+    assert last_id not in {lease["id"] for lease in leases}
+
+    resp_rest = await client.post("/api/v1/users/claim", params={"count": 2})
+    assert [lease["id"] for lease in resp_rest.json()] == [last_id]
+    assert (await client.post("/api/v1/users/free/claim")).status_code == 404
+
+    # в Postgres (здесь SQLite) ни одного UPDATE: стратегия не lru —
+    # не меняются ни колонки аренды, ни last_used_at
+    async with AsyncSessionLocalTest() as db:
+        result = await db.execute(
+            select(User.id, User.locktime, User.last_used_at).where(User.id.in_([UUID(i) for i in ids]))
+        )
+        rows = result.all()
+    assert [row.locktime for row in rows] == [None, None, None]
+    assert {row.id: row.last_used_at for row in rows} == last_used
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_acquire_renew_release(
+    client: AsyncClient,
+    prepare_database,
+    redis_backend,
+) -> None:
+    """
+    Проверяем Redis-бэкенд на ручных операциях:
+    acquire/renew/release с теми же кодами ответа, что и у Postgres-бэкенда.
+    """
+    [user_id] = await _create_users(client, 1)
+
+    resp_acquire = await client.post(f"/api/v1/users/{user_id}/acquire", params={"ttl": 30})
+    assert resp_acquire.status_code == 200
+    lease = resp_acquire.json()
+    assert lease["locked"] is True
+
+    locktime, expires_at = await redis_backend.lease_state(None, UUID(user_id))
+    assert (locktime.isoformat(), expires_at.isoformat()) == (
+        lease["locktime"].replace("Z", "+00:00"),
+        lease["expires_at"].replace("Z", "+00:00"),
+    )
+
+    assert (await client.post(f"/api/v1/users/{user_id}/acquire")).status_code == 409
+    assert (await client.post(f"/api/v1/users/{uuid.uuid4()}/acquire")).status_code == 404
+
+    foreign = str(uuid.uuid4())
+    resp_renew_foreign = await client.post(
+        f"/api/v1/users/{user_id}/renew", params={"lease_token": foreign}
+    )
+    assert resp_renew_foreign.status_code == 409
+
+    resp_renew = await client.post(
+        f"/api/v1/users/{user_id}/renew",
+        params={"lease_token": lease["lease_token"], "ttl": 120},
+    )
+    assert resp_renew.status_code == 200
+    assert resp_renew.json()["expires_at"] > lease["expires_at"]
+    assert resp_renew.json()["locktime"] == lease["locktime"]
+
+    resp_release_foreign = await client.post(
+        f"/api/v1/users/{user_id}/release", params={"lease_token": foreign}
+    )
+    assert resp_release_foreign.status_code == 409
+
+    resp_release = await client.post(
+        f"/api/v1/users/{user_id}/release", params={"lease_token": lease["lease_token"]}
+    )
+    assert resp_release.status_code == 200
+    assert resp_release.json()["message"] == "User successfully unlocked."
+
+    resp_release_again = await client.post(
+        f"/api/v1/users/{user_id}/release", params={"lease_token": lease["lease_token"]}
+    )
+    assert resp_release_again.json()["message"] == "User was not locked."
+    assert await redis_backend.lease_state(None, UUID(user_id)) == (None, None)
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_concurrent_claims_are_disjoint(
+    client: AsyncClient,
+    prepare_database,
+    redis_backend,
+) -> None:
+    """Конкурентные claim'ы не получают одного и того же пользователя дважды."""
+    ids = await _create_users(client, 3)
+
+    async def claim_one():
+        async with AsyncSessionLocalTest() as db:
+            users = await redis_backend.claim(db, 1, None, None, None)
+            return [str(user.id) for user in users]
+
+    results = await asyncio.gather(*(claim_one() for _ in range(6)))
+    claimed = [user_id for result in results for user_id in result]
+
+    assert sorted(claimed) == sorted(ids)
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_bulk_acquire_release(
+    client: AsyncClient,
+    prepare_database,
+    redis_backend,
+) -> None:
+    """Массовые acquire/release в Redis-бэкенде: те же статусы, что и у Postgres."""
+    ids = await _create_users(client, 3)
+    missing = str(uuid.uuid4())
+
+    assert (await client.post(f"/api/v1/users/{ids[0]}/acquire")).status_code == 200
+
+    resp = await client.post("/api/v1/users/acquire", json=[ids[0], ids[1], missing])
+    outcomes = resp.json()
+    assert [o["status"] for o in outcomes] == ["already_locked", "locked", "not_found"]
+
+    resp = await client.post(
+        "/api/v1/users/release",
+        json=[ids[0], ids[1], ids[2], missing],
+        params={"lease_token": outcomes[1]["lease_token"]},
+    )
+    assert [o["status"] for o in resp.json()] == ["conflict", "released", "not_locked", "not_found"]
+
+    resp = await client.post("/api/v1/users/release", json=[ids[0]], params={"force": True})
+    assert [o["status"] for o in resp.json()] == ["released"]
+    assert await redis_backend.client.keys(f"{redis_backend.prefix}:lock:*") == []
+
+
+def _count_claim_calls(backend: RedisLockBackend) -> list:
+    """Подсчитать вызовы claim-скрипта (по одному на пачку кандидатов)."""
+    calls = []
+    script = backend._claim
+
+    async def counted(**kwargs):
+        calls.append(kwargs["keys"])
+        return await script(**kwargs)
+
+    backend._claim = counted
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_scan_pages_by_keyset(
+    client: AsyncClient,
+    prepare_database,
+    redis_backend,
+    monkeypatch,
+) -> None:
+    """
+    Занятые в Redis (невидимые в БД) пропускаются пачками по keyset:
+    свободный за несколькими пачками занятых всё равно находится.
+    """
+    monkeypatch.setattr(settings, "redis_lock_scan_batch", 2)
+    ids = await _create_users(client, 5)
+    for user_id in ids[:4]:
+        await redis_backend.client.set(redis_backend._key(user_id), "foreign|x|y")
+
+    calls = _count_claim_calls(redis_backend)
+    resp = await client.post("/api/v1/users/free/claim", params={"strategy": "oldest"})
+    assert resp.json()["id"] == ids[4]
+    assert len(calls) == 3
+    assert len({key for keys in calls for key in keys}) == 5
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_skips_held_users(
+    client: AsyncClient,
+    prepare_database,
+    redis_backend,
+    monkeypatch,
+) -> None:
+    """
+    Повторные claim'ы не перебирают уже занятых с начала:
+    - lru — выдача пишет last_used_at, занятые уходят в хвост
+    - oldest — скан начинается с курсора последнего выданного и «заворачивает»
+    """
+    monkeypatch.setattr(settings, "redis_lock_scan_batch", 2)
+    ids = await _create_users(client, 4)
+    calls = _count_claim_calls(redis_backend)
+
+    for strategy in ("lru", "oldest"):
+        calls.clear()
+        leases = []
+        for _ in range(4):
+            resp = await client.post("/api/v1/users/free/claim", params={"strategy": strategy})
+            assert resp.status_code == 200
+            leases.append(resp.json())
+        # каждый claim укладывается в одну пачку кандидатов
+        assert len(calls) == 4
+        assert sorted(lease["id"] for lease in leases) == sorted(ids)
+
+        for lease in leases:
+            await client.post(
+                f"/api/v1/users/{lease['id']}/release",
+                params={"lease_token": lease["lease_token"]},
+            )
+
+    # oldest шёл по возрасту, а после release курсор «завернул» на начало
+    assert [lease["id"] for lease in leases] == ids
+    resp = await client.post("/api/v1/users/free/claim", params={"strategy": "oldest"})
+    assert resp.json()["id"] == ids[0]
+
+    async with AsyncSessionLocalTest() as db:
+        result = await db.execute(
+            select(User.created_at, User.last_used_at).where(User.id == UUID(ids[0]))
+        )
+        user = result.one()
+        assert user.last_used_at > user.created_at
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_releases_keys_when_db_fails(
+    client: AsyncClient,
+    prepare_database,
+    redis_backend,
+    monkeypatch,
+) -> None:
+    """
+    Ключи уже заняты, а запись в БД после этого упала — claim, acquire
+    и bulk acquire снимают свои ключи, пользователи снова свободны.
+    """
+    ids = await _create_users(client, 2)
+
+    publish = lock_events.publish
+
+    async def broken_publish(*args, **kwargs):
+        raise RuntimeError("db is gone")
+
+    monkeypatch.setattr(lock_events, "publish", broken_publish)
+    for method, url, kwargs in (
+        ("POST", "/api/v1/users/claim", {"params": {"count": 2}}),
+        ("POST", f"/api/v1/users/{ids[0]}/acquire", {}),
+        ("POST", "/api/v1/users/acquire", {"json": ids}),
+    ):
+        with pytest.raises(RuntimeError):
+            await client.request(method, url, **kwargs)
+        assert await redis_backend.client.keys(f"{redis_backend.prefix}:lock:*") == []
+
+    monkeypatch.setattr(lock_events, "publish", publish)
+    resp = await client.post("/api/v1/users/claim", params={"count": 2})
+    assert sorted(lease["id"] for lease in resp.json()) == sorted(ids)
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_stats_and_locked_filter(
+    client: AsyncClient,
+    prepare_database,
+    redis_backend,
+) -> None:
+    """
+    /users/stats учитывает аренды из Redis,
+    фильтр locked в GET /users с Redis-бэкендом — 400.
+    """
+    _stats_cache.clear()
+    ids = await _create_users(client, 3)
+    assert (await client.post(f"/api/v1/users/{ids[0]}/acquire")).status_code == 200
+
+    [group] = (await client.get("/api/v1/users/stats")).json()
+    assert (group["free"], group["locked"], group["expired"], group["total"]) == (2, 1, 0, 3)
+
+    assert (await client.get("/api/v1/users/", params={"locked": True})).status_code == 400
+    assert (await client.get("/api/v1/users/")).status_code == 200
@@ -0,0 +1,92 @@
+import uuid
+from pathlib import Path
+
+import pytest
+import sqlalchemy
+from alembic import command
+from sqlalchemy import create_engine, inspect, text
+
+from app.core.config import settings
+from app.db.migrate import alembic_config, current_revisions, migrate, script_heads
+
+
+def _sqlite_url(tmp_path: Path, revisions: list[str]) -> str:
+    url = f"sqlite:///{tmp_path / 'migrate.db'}"
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        if revisions:
+            conn.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL)"))
+            for revision in revisions:
+                conn.execute(text("INSERT INTO alembic_version VALUES (:rev)"), {"rev": revision})
+    engine.dispose()
+    return url
+
+
+def test_migrate_skips_alembic_when_schema_is_current(tmp_path: Path, monkeypatch) -> None:
+    """Версия в БД совпадает с head — Alembic не запускается."""
+    url = _sqlite_url(tmp_path, sorted(script_heads()))
+
+    def fail(*args, **kwargs):
+        pytest.fail("alembic upgrade must not run")
+
+    monkeypatch.setattr(command, "upgrade", fail)
+
+    assert migrate(url) is False
+
+
+def test_migrate_runs_alembic_on_shared_connection(tmp_path: Path, monkeypatch) -> None:
+    """
+    Схема отстаёт — настоящий upgrade head на SQLite (advisory-lock там
+    не берётся) на соединении migrate(): env.py не открывает своё.
+    """
+    url = _sqlite_url(tmp_path, [])
+
+    def no_engine(*args, **kwargs):
+        pytest.fail("env.py must use the connection passed by migrate()")
+
+    monkeypatch.setattr(sqlalchemy, "engine_from_config", no_engine)
+
+    assert migrate(url) is True
+
+    engine = create_engine(url)
+    try:
+        with engine.connect() as conn:
+            assert current_revisions(conn) == script_heads()
+            columns = {column["name"] for column in inspect(conn).get_columns("users")}
+            indexes = {index["name"] for index in inspect(conn).get_indexes("users")}
+    finally:
+        engine.dispose()
+
+    assert {"expires_at", "lease_token", "last_used_at"} <= columns
+    assert {"ix_users_free_lookup", "ix_users_lru_lookup", "ix_users_random_lookup"} <= indexes
+
+    assert migrate(url) is False
+
+
+def test_lease_backfill_uses_configured_lock_timeout(tmp_path: Path, monkeypatch) -> None:
+    """
+    Lock'и, стоявшие до колонок аренды, получают expires_at =
+    locktime + lock_timeout_seconds деплоя, а не 300 сек по умолчанию.
+    """
+    monkeypatch.setattr(settings, "lock_timeout_seconds", 600)
+    url = _sqlite_url(tmp_path, [])
+    config = alembic_config()
+    engine = create_engine(url)
+    try:
+        with engine.connect() as conn:
+            config.attributes["connection"] = conn
+            command.upgrade(config, "70c05423c4e0")
+            conn.execute(
+                text(
+                    "INSERT INTO users (id, created_at, login, password, project_id, env, domain, locktime) "
+                    "VALUES (:id, '2026-01-01 00:00:00', 'old@example.com', 'x', :project_id, "
+                    "'prod', 'regular', '2026-01-01 12:00:00')"
+                ),
+                {"id": uuid.uuid4().hex, "project_id": uuid.uuid4().hex},
+            )
+            command.upgrade(config, "head")
+            expires_at = conn.execute(text("SELECT expires_at FROM users")).scalar_one()
+    finally:
+        engine.dispose()
+
+    assert expires_at == "2026-01-01 12:10:00"
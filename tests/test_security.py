@@ -0,0 +1,36 @@
+import pytest
+
+from app.core import security
+from app.core.config import settings
+from app.core.security import (
+    hash_password,
+    hash_password_async,
+    verify_password,
+    verify_password_async,
+)
+
+
+@pytest.mark.asyncio
+async def test_async_password_hashing_roundtrip() -> None:
+    """
+    Async-варианты хеширования совместимы с синхронными:
+    - хэш из пула проверяется синхронно и наоборот
+    - неверный пароль не проходит
+    """
+    hashed = await hash_password_async("secret123")
+    assert verify_password("secret123", hashed)
+
+    assert await verify_password_async("secret123", hash_password("secret123"))
+    assert not await verify_password_async("wrong", hashed)
+
+
+def test_hash_pool_sized_by_cpu_quota(monkeypatch) -> None:
+    """По умолчанию пул хеширования — по доступным ядрам с учётом квоты, а не по ядрам хоста."""
+    monkeypatch.setattr(settings, "password_hash_workers", None)
+    monkeypatch.setattr(settings, "password_hash_executor", "thread")
+    monkeypatch.setattr(security, "available_cpus", lambda: 2)
+    security.shutdown_hash_executor()
+    try:
+        assert security.get_hash_executor()._max_workers == 2
+    finally:
+        security.shutdown_hash_executor()
@@ -0,0 +1,80 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from app.server import prepare_metrics_dir
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_prepare_metrics_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Один воркер — без multiprocess-режима; несколько — каталог готов и очищен."""
+    monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR", raising=False)
+    assert prepare_metrics_dir(1) is None
+    assert "PROMETHEUS_MULTIPROC_DIR" not in os.environ
+
+    path = prepare_metrics_dir(4)
+    assert path is not None and os.path.isdir(path)
+    assert os.environ["PROMETHEUS_MULTIPROC_DIR"] == path
+    os.rmdir(path)
+
+    (tmp_path / "counter_123.db").write_bytes(b"stale")
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    assert prepare_metrics_dir(1) == str(tmp_path)
+    assert list(tmp_path.iterdir()) == []
+
+
+def _run_worker(metrics_dir: Path, code: str) -> str:
+    """Отдельный процесс, как воркер uvicorn: prometheus_client импортируется уже с каталогом."""
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(metrics_dir)}
+    script = "import os\nfrom app.core import metrics\n" + code
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout
+
+
+def test_metrics_aggregated_across_workers(tmp_path: Path) -> None:
+    """
+    Счётчики из разных воркеров складываются в одном /metrics;
+    «запросы в полёте» штатно остановленного воркера уходят сразу,
+    упавшего — после sweep_dead_workers на старте следующего.
+    """
+    _run_worker(
+        tmp_path,
+        'metrics.USERS_CLAIMED.inc(2)\n'
+        'metrics.REQUESTS_IN_FLIGHT.labels("GET").inc()\n'
+        "metrics.mark_worker_dead()\n",
+    )
+    crashed_pid = _run_worker(
+        tmp_path,
+        'metrics.USERS_CLAIMED.inc(3)\n'
+        'metrics.REQUESTS_IN_FLIGHT.labels("POST").inc()\n'
+        "print(os.getpid())\n",
+    ).strip()
+
+    output = _run_worker(
+        tmp_path,
+        "body = metrics.render_metrics()[0].decode()\n"
+        "print(body)\n"
+        "print('swept', metrics.sweep_dead_workers())\n"
+        "print(metrics.render_metrics()[0].decode())\n",
+    )
+    before, _, after = output.partition("swept")
+
+    assert "botofarm_users_claimed_total 5.0" in before
+    assert 'botofarm_http_requests_in_flight{method="GET"}' not in before
+    assert 'botofarm_http_requests_in_flight{method="POST"} 1.0' in before
+    assert "botofarm_db_pool_connections" in before
+
+    assert after.startswith(f" [{crashed_pid}]")
+    assert "botofarm_users_claimed_total 5.0" in after
+    assert 'botofarm_http_requests_in_flight{method="POST"}' not in after
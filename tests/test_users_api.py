@@ -1,7 +1,22 @@
+import asyncio
+import json
 import uuid
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
 
 import pytest
 from httpx import AsyncClient
+from prometheus_client import REGISTRY
+
+from app.api.v1.users import _sse_user_events
+from app.core.config import settings
+from app.main import app
+from app.models.user import User
+from app.schemas.user import UserFilter, UserRead
+from app.services.lock_events import free_user_waiters, user_events
+from app.services.lock_reaper import reap_once
+from app.services.user_service import _stats_cache
+from tests.conftest import AsyncSessionLocalTest
 
 
 @pytest.mark.asyncio
@@ -112,8 +127,11 @@ async def test_acquire_and_release_lock(
     # data_acquire = resp_acquire.json()
     # assert data_acquire["id"] == user_id
 
-    # снимаем блокировку
-    resp_release = await client.post(f"/api/v1/users/{user_id}/release")
+    # снимаем блокировку токеном из ответа acquire
+    resp_release = await client.post(
+        f"/api/v1/users/{user_id}/release",
+        params={"lease_token": resp_acquire.json()["lease_token"]},
+    )
     assert resp_release.status_code == 200
 
     # и снова можно проверить тело ответа, если схема UserLockResponse это позволяет
@@ -157,3 +175,809 @@ async def test_acquire_lock_twice_fails(
     # Пока что делаем мягко, лишь бы был неуспех
     assert resp_acquire_2.status_code >= 400
     assert resp_acquire_2.status_code != 200
+
+    # административный сброс без токена держателя — только с force
+    resp_force = await client.post(
+        f"/api/v1/users/{user_id}/release", params={"force": True}
+    )
+    assert resp_force.status_code == 200
+    assert resp_force.json()["message"] == "User successfully unlocked."
+
+
+@pytest.mark.asyncio
+async def test_claim_free_user(
+    client: AsyncClient,
+    prepare_database,
+) -> None:
+    """
+    Проверяем, что:
+    - POST /api/v1/users/free/claim сразу возвращает залоченного пользователя
+    - повторный claim, когда свободных больше нет, возвращает 404
+    """
+    payload = {
+        "login": f"claim_{uuid.uuid4().hex[:6]}@example.com",
+        "password": "secret123",
+        "project_id": str(uuid.uuid4()),
+        "env": "prod",
+        "domain": "regular",
+    }
+
+    resp_create = await client.post("/api/v1/users/", json=payload)
+    assert resp_create.status_code == 201
+
+    resp_claim = await client.post("/api/v1/users/free/claim")
+    assert resp_claim.status_code == 200
+
+    data = resp_claim.json()
+    assert data["login"] == payload["login"]
+    assert data["locktime"] is not None
+
+    # единственный пользователь уже занят
+    resp_claim_2 = await client.post("/api/v1/users/free/claim")
+    assert resp_claim_2.status_code == 404
+
+    # и вручную его тоже не залочить
+    resp_acquire = await client.post(f"/api/v1/users/{data['id']}/acquire")
+    assert resp_acquire.status_code == 409
+
+
+@pytest.mark.asyncio
+async def test_expired_lock_is_free_and_reaped(
+    client: AsyncClient,
+    prepare_database,
+) -> None:
+    """
+    Проверяем, что:
+    - протухший lock считается свободным в /free без записи в БД
+    - reaper снимает протухшие lock'и
+    """
+    payload = {
+        "login": f"stale_{uuid.uuid4().hex[:6]}@example.com",
+        "password": "secret123",
+        "project_id": str(uuid.uuid4()),
+        "env": "prod",
+        "domain": "regular",
+    }
+    resp_create = await client.post("/api/v1/users/", json=payload)
+    assert resp_create.status_code == 201
+    user_id = UUID(resp_create.json()["id"])
+
+    # ставим lock «из прошлого» с уже истёкшей арендой
+    stale = datetime.now(timezone.utc) - timedelta(seconds=settings.lock_timeout_seconds + 60)
+    async with AsyncSessionLocalTest() as db:
+        user = await db.get(User, user_id)
+        user.locktime = stale
+        user.expires_at = stale + timedelta(seconds=settings.lock_timeout_seconds)
+        await db.commit()
+
+    resp_free = await client.get("/api/v1/users/free")
+    assert resp_free.status_code == 200
+    assert resp_free.json()["id"] == str(user_id)
+
+    assert await reap_once(AsyncSessionLocalTest) == 1
+
+    async with AsyncSessionLocalTest() as db:
+        user = await db.get(User, user_id)
+        assert user.locktime is None
+        assert user.expires_at is None
+
+
+@pytest.mark.asyncio
+async def test_claim_takes_unlocked_then_expired(
+    client: AsyncClient,
+    prepare_database,
+) -> None:
+    """
+    Проверяем, что claim добирает протухшие аренды после незалоченных
+    (два запроса free_candidates), а занятые не трогает.
+    """
+    project_id = str(uuid.uuid4())
+    ids = []
+    for i in range(3):
+        resp = await client.post(
+            "/api/v1/users/",
+            json={
+                "login": f"phase_{i}@example.com",
+                "password": "secret123",
+                "project_id": project_id,
+                "env": "prod",
+                "domain": "regular",
+            },
+        )
+        assert resp.status_code == 201
+        ids.append(UUID(resp.json()["id"]))
+
+    now = datetime.now(timezone.utc)
+    async with AsyncSessionLocalTest() as db:
+        expired = await db.get(User, ids[0])
+        expired.locktime = now - timedelta(minutes=10)
+        expired.expires_at = now - timedelta(minutes=1)
+        held = await db.get(User, ids[1])
+        held.locktime = now
+        held.expires_at = now + timedelta(minutes=10)
+        await db.commit()
+
+    resp_claim = await client.post(
+        "/api/v1/users/claim",
+        params={"count": 3, "project_id": project_id, "strategy": "oldest"},
+    )
+    assert resp_claim.status_code == 200
+    assert [lease["id"] for lease in resp_claim.json()] == [str(ids[2]), str(ids[0])]
+
+
+@pytest.mark.asyncio
+async def test_free_user_filters(
+    client: AsyncClient,
+    prepare_database,
+) -> None:
+    """
+    Проверяем, что /free и /free/claim учитывают project_id/env/domain.
+    """
+    project_id = str(uuid.uuid4())
+    payload_prod = {
+        "login": "filter_prod@example.com",
+        "password": "secret123",
+        "project_id": project_id,
+        "env": "prod",
+        "domain": "regular",
+    }
+    payload_stage = {
+        "login": "filter_stage@example.com",
+        "password": "secret123",
+        "project_id": project_id,
+        "env": "stage",
+        "domain": "canary",
+    }
+    assert (await client.post("/api/v1/users/", json=payload_prod)).status_code == 201
+    assert (await client.post("/api/v1/users/", json=payload_stage)).status_code == 201
+
+    params = {"project_id": project_id, "env": "stage", "domain": "canary"}
+    resp_free = await client.get("/api/v1/users/free", params=params)
+    assert resp_free.status_code == 200
+    assert resp_free.json()["login"] == payload_stage["login"]
+
+    resp_claim = await client.post("/api/v1/users/free/claim", params=params)
+    assert resp_claim.status_code == 200
+    assert resp_claim.json()["login"] == payload_stage["login"]
+
+    # под этот фильтр свободных больше нет, хотя prod-пользователь свободен
+    resp_claim_2 = await client.post("/api/v1/users/free/claim", params=params)
+    assert resp_claim_2.status_code == 404
+
+    resp_other = await client.get(
+        "/api/v1/users/free", params={"project_id": str(uuid.uuid4())}
+    )
+    assert resp_other.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_claim_batch_partial_fill(
+    client: AsyncClient,
+    prepare_database,
+) -> None:
+    """
+    Проверяем, что POST /api/v1/users/claim?count=N:
+    - лочит сразу несколько пользователей
+    - при нехватке свободных возвращает сколько есть
+    """
+    project_id = str(uuid.uuid4())
+    for i in range(3):
+        payload = {
+            "login": f"batch_{i}@example.com",
+            "password": "secret123",
+            "project_id": project_id,
+            "env": "prod",
+            "domain": "regular",
+        }
+        assert (await client.post("/api/v1/users/", json=payload)).status_code == 201
+
+    resp_1 = await client.post(
+        "/api/v1/users/claim", params={"count": 2, "project_id": project_id}
+    )
+    assert resp_1.status_code == 200
+    first = resp_1.json()
+    assert len(first) == 2
+    assert all(u["locktime"] is not None for u in first)
+
+    resp_2 = await client.post("/api/v1/users/claim", params={"count": 5})
+    assert resp_2.status_code == 200
+    second = resp_2.json()
+    assert len(second) == 1
+    assert second[0]["id"] not in {u["id"] for u in first}
+
+    resp_3 = await client.post("/api/v1/users/claim", params={"count": 5})
+    assert resp_3.status_code == 200
+    assert resp_3.json() == []
+
+
+@pytest.mark.asyncio
+async def test_get_users_keyset_pagination(
+    client: AsyncClient,
+    prepare_database,
+) -> None:
+    """
+    Проверяем, что GET /api/v1/users/:
+    - отдаёт страницы по limit и курсор в X-Next-Cursor
+    - фильтрует по project_id и locked
+    """
+    project_id = str(uuid.uuid4())
+    logins = []
+    for i in range(5):
+        payload = {
+            "login": f"page_{i}@example.com",
+            "password": "secret123",
+            "project_id": project_id,
+            "env": "prod",
+            "domain": "regular",
+        }
+        assert (await client.post("/api/v1/users/", json=payload)).status_code == 201
+        logins.append(payload["login"])
+
+    seen = []
+    params = {"limit": 2, "project_id": project_id}
+    while True:
+        resp = await client.get("/api/v1/users/", params=params)
+        assert resp.status_code == 200
+        page = resp.json()
+        assert len(page) <= 2
+        seen.extend(u["login"] for u in page)
+        next_cursor = resp.headers.get("X-Next-Cursor")
+        if next_cursor is None:
+            break
+        params["cursor"] = next_cursor
+
+    # все пользователи ровно по одному разу, новые сверху
+    assert seen == list(reversed(logins))
+
+    claimed = (await client.post("/api/v1/users/free/claim")).json()
+    resp_locked = await client.get("/api/v1/users/", params={"locked": True})
+    assert [u["id"] for u in resp_locked.json()] == [claimed["id"]]
+
+    resp_free = await client.get("/api/v1/users/", params={"locked": False})
+    assert len(resp_free.json()) == 4
+
+    resp_bad = await client.get("/api/v1/users/", params={"cursor": "garbage"})
+    assert resp_bad.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_read_path_matches_user_read_schema(
+    client: AsyncClient,
+    prepare_database,
+) -> None:
+    """
+    Лёгкий путь чтения (колонки + TypeAdapter) отдаёт ровно поля UserRead
+    и те же значения, что и создание пользователя (без хеша пароля).
+    """
+    payload = {
+        "login": f"read_{uuid.uuid4().hex[:6]}@example.com",
+        "password": "secret123",
+        "project_id": str(uuid.uuid4()),
+        "env": "prod",
+        "domain": "regular",
+    }
+    resp_create = await client.post("/api/v1/users/", json=payload)
+    created = resp_create.json()
+
+    listed = (await client.get("/api/v1/users/")).json()
+    free = (await client.get("/api/v1/users/free")).json()
+
+    for body in (listed[0], free):
+        assert set(body) == set(UserRead.model_fields)
+        assert UserRead.model_validate(body) == UserRead.model_validate(created)
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_users(
+    client: AsyncClient,
+    prepare_database,
+) -> None:
+    """
+    Проверяем, что POST /api/v1/users/bulk:
+    - создаёт новых пользователей
+    - пропускает уже существующие логины и дубли внутри запроса
+    """
+    project_id = str(uuid.uuid4())
+
+    def make(login: str) -> dict:
+        return {
+            "login": login,
+            "password": "secret123",
+            "project_id": project_id,
+            "env": "prod",
+            "domain": "regular",
+        }
+
+    resp_single = await client.post("/api/v1/users/", json=make("bulk_0@example.com"))
+    assert resp_single.status_code == 201
+
+    items = [make(f"bulk_{i}@example.com") for i in range(4)]
+    items.append(make("bulk_1@example.com"))
+
+    resp = await client.post("/api/v1/users/bulk", json=items)
+    assert resp.status_code == 201
+
+    data = resp.json()
+    assert sorted(data["created"]) == [
+        "bulk_1@example.com",
+        "bulk_2@example.com",
+        "bulk_3@example.com",
+    ]
+    assert sorted(data["skipped"]) == ["bulk_0@example.com", "bulk_1@example.com"]
+
+    # созданные пользователи могут залогиниться
+    token_resp = await client.post(
+        "/api/v1/token",
+        data={
+            "username": "bulk_2@example.com",
+            "password": "secret123",
+            "grant_type": "password",
+        },
+    )
+    assert token_resp.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_lease_renew_and_release_by_holder(
+    client: AsyncClient,
+    prepare_database,
+) -> None:
+    """
+    Проверяем аренду:
+    - claim с ttl выставляет expires_at и выдаёт lease_token
+    - renew и release работают только с токеном держателя
+    - release без токена — 400, без force чужую аренду не снять
+    """
+    payload = {
+        "login": f"lease_{uuid.uuid4().hex[:6]}@example.com",
+        "password": "secret123",
+        "project_id": str(uuid.uuid4()),
+        "env": "prod",
+        "domain": "regular",
+    }
+    assert (await client.post("/api/v1/users/", json=payload)).status_code == 201
+
+    resp_claim = await client.post("/api/v1/users/free/claim", params={"ttl": 30})
+    assert resp_claim.status_code == 200
+    lease = resp_claim.json()
+    assert lease["expires_at"] is not None
+    assert lease["lease_token"] is not None
+    user_id = lease["id"]
+
+    resp_renew = await client.post(
+        f"/api/v1/users/{user_id}/renew",
+        params={"lease_token": lease["lease_token"], "ttl": 120},
+    )
+    assert resp_renew.status_code == 200
+    assert resp_renew.json()["expires_at"] > lease["expires_at"]
+
+    foreign = str(uuid.uuid4())
+    resp_renew_foreign = await client.post(
+        f"/api/v1/users/{user_id}/renew", params={"lease_token": foreign}
+    )
+    assert resp_renew_foreign.status_code == 409
+
+    resp_release_foreign = await client.post(
+        f"/api/v1/users/{user_id}/release", params={"lease_token": foreign}
+    )
+    assert resp_release_foreign.status_code == 409
+
+    resp_release_tokenless = await client.post(f"/api/v1/users/{user_id}/release")
+    assert resp_release_tokenless.status_code == 400
+
+    resp_bulk_tokenless = await client.post("/api/v1/users/release", json=[user_id])
+    assert resp_bulk_tokenless.status_code == 400
+
+    resp_locked = await client.get("/api/v1/users/", params={"locked": True})
+    assert [u["id"] for u in resp_locked.json()] == [user_id]
+
+    resp_release = await client.post(
+        f"/api/v1/users/{user_id}/release", params={"lease_token": lease["lease_token"]}
+    )
+    assert resp_release.status_code == 200
+    assert resp_release.json()["locked"] is False
+
+    # после release аренду продлить уже нельзя
+    resp_renew_after = await client.post(
+        f"/api/v1/users/{user_id}/renew", params={"lease_token": lease["lease_token"]}
+    )
+    assert resp_renew_after.status_code == 409
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("strategy", ["oldest", "lru", "random"])
+async def test_claim_selection_strategies(
+    client: AsyncClient,
+    prepare_database,
+    strategy: str,
+) -> None:
+    """
+    Любая стратегия выбора отдаёт всех свободных пользователей ровно по разу,
+    а strategy=lru после release выдаёт сначала тех, кого давно не брали.
+    """
+    for i in range(4):
+        payload = {
+            "login": f"strategy_{i}@example.com",
+            "password": "secret123",
+            "project_id": str(uuid.uuid4()),
+            "env": "prod",
+            "domain": "regular",
+        }
+        assert (await client.post("/api/v1/users/", json=payload)).status_code == 201
+
+    params = {"strategy": strategy, "caller": "bot-1"}
+    claimed = []
+    for _ in range(4):
+        resp = await client.post("/api/v1/users/free/claim", params=params)
+        assert resp.status_code == 200
+        claimed.append(resp.json())
+
+    assert len({u["id"] for u in claimed}) == 4
+    assert (await client.post("/api/v1/users/free/claim", params=params)).status_code == 404
+
+    if strategy == "lru":
+        # освобождаем в обратном порядке: дольше всех не использовался первый
+        for user in reversed(claimed):
+            resp = await client.post(
+                f"/api/v1/users/{user['id']}/release",
+                params={"lease_token": user["lease_token"]},
+            )
+            assert resp.status_code == 200
+
+        resp = await client.post("/api/v1/users/free/claim", params=params)
+        assert resp.json()["id"] == claimed[0]["id"]
+
+
+@pytest.mark.asyncio
+async def test_claim_waits_for_released_user(
+    client: AsyncClient,
+    prepare_database,
+) -> None:
+    """
+    Long-poll: claim с wait не отвечает 404 сразу, а дожидается release
+    и получает освободившегося пользователя.
+    """
+    payload = {
+        "login": f"wait_{uuid.uuid4().hex[:6]}@example.com",
+        "password": "secret123",
+        "project_id": str(uuid.uuid4()),
+        "env": "prod",
+        "domain": "regular",
+    }
+    assert (await client.post("/api/v1/users/", json=payload)).status_code == 201
+
+    holder = (await client.post("/api/v1/users/free/claim")).json()
+
+    # без wait — сразу 404
+    assert (await client.post("/api/v1/users/free/claim")).status_code == 404
+
+    waiting = asyncio.create_task(
+        client.post("/api/v1/users/free/claim", params={"wait": 10})
+    )
+    # даём запросу встать в очередь ожидающих
+    while len(free_user_waiters) == 0:
+        await asyncio.sleep(0.01)
+
+    started = asyncio.get_running_loop().time()
+    resp_release = await client.post(
+        f"/api/v1/users/{holder['id']}/release",
+        params={"lease_token": holder["lease_token"]},
+    )
+    assert resp_release.status_code == 200
+
+    resp_wait = await asyncio.wait_for(waiting, timeout=5)
+    assert resp_wait.status_code == 200
+    assert resp_wait.json()["id"] == holder["id"]
+    # разбудило событие, а не периодическая перепроверка
+    assert asyncio.get_running_loop().time() - started < settings.free_user_wait_recheck_seconds
+
+    # ожидание с таймаутом без освобождений заканчивается 404
+    resp_timeout = await client.get("/api/v1/users/free", params={"wait": 0.2})
+    assert resp_timeout.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_user_events_stream(
+    client: AsyncClient,
+    prepare_database,
+) -> None:
+    """
+    Подписчик SSE получает created/locked/released только по своему project_id.
+    """
+    project_id = str(uuid.uuid4())
+    stream = _sse_user_events(UserFilter(project_id=project_id))
+    assert await stream.__anext__() == ": connected\n\n"
+
+    other = {
+        "login": "events_other@example.com",
+        "password": "secret123",
+        "project_id": str(uuid.uuid4()),
+        "env": "prod",
+        "domain": "regular",
+    }
+    mine = dict(other, login="events_mine@example.com", project_id=project_id)
+    assert (await client.post("/api/v1/users/", json=other)).status_code == 201
+    assert (await client.post("/api/v1/users/", json=mine)).status_code == 201
+
+    claimed = (
+        await client.post("/api/v1/users/free/claim", params={"project_id": project_id})
+    ).json()
+    await client.post(
+        f"/api/v1/users/{claimed['id']}/release",
+        params={"lease_token": claimed["lease_token"]},
+    )
+
+    received = []
+    for _ in range(3):
+        chunk = await asyncio.wait_for(stream.__anext__(), timeout=1)
+        event_line, data_line, _ = chunk.split("\n", 2)
+        users = json.loads(data_line.removeprefix("data: "))
+        received.append((event_line.removeprefix("event: "), [u["id"] for u in users]))
+
+    assert received == [
+        ("created", [claimed["id"]]),
+        ("locked", [claimed["id"]]),
+        ("released", [claimed["id"]]),
+    ]
+
+    await stream.aclose()
+    assert len(user_events) == 0
+
+
+@pytest.mark.asyncio
+async def test_user_events_endpoint(
+    client: AsyncClient,
+    prepare_database,
+) -> None:
+    """
+    GET /users/events по HTTP: text/event-stream, no-cache/keep-alive
+    и кадр события после публикации.
+    ASGITransport httpx буферизует тело целиком, поэтому бесконечный поток
+    читаем, вызывая ASGI-приложение напрямую, и закрываем через http.disconnect.
+    """
+    project_id = str(uuid.uuid4())
+    sent: asyncio.Queue = asyncio.Queue()
+    disconnected = asyncio.Event()
+
+    async def receive():
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/api/v1/users/events",
+        "raw_path": b"/api/v1/users/events",
+        "root_path": "",
+        "query_string": f"project_id={project_id}".encode(),
+        "headers": [(b"host", b"test")],
+        "client": ("test", 1),
+        "server": ("test", 80),
+    }
+    stream = asyncio.create_task(app(scope, receive, sent.put))
+
+    start = await asyncio.wait_for(sent.get(), timeout=1)
+    assert start["status"] == 200
+    headers = {name.decode(): value.decode() for name, value in start["headers"]}
+    assert headers["content-type"].startswith("text/event-stream")
+    assert headers["cache-control"] == "no-cache"
+    assert headers["connection"] == "keep-alive"
+
+    connected = await asyncio.wait_for(sent.get(), timeout=1)
+    assert connected["body"] == b": connected\n\n"
+
+    # открытый поток — не «запрос в полёте», а отдельный gauge
+    assert REGISTRY.get_sample_value("botofarm_event_streams_open") == 1
+    assert not REGISTRY.get_sample_value("botofarm_http_requests_in_flight", {"method": "GET"})
+
+    payload = {
+        "login": "events_http@example.com",
+        "password": "secret123",
+        "project_id": project_id,
+        "env": "prod",
+        "domain": "regular",
+    }
+    created = (await client.post("/api/v1/users/", json=payload)).json()
+
+    frame = (await asyncio.wait_for(sent.get(), timeout=1))["body"].decode()
+    event_line, data_line, _ = frame.split("\n", 2)
+    assert event_line == "event: created"
+    assert [u["id"] for u in json.loads(data_line.removeprefix("data: "))] == [created["id"]]
+
+    disconnected.set()
+    await asyncio.wait_for(stream, timeout=1)
+    assert len(user_events) == 0
+
+    assert REGISTRY.get_sample_value("botofarm_event_streams_open") == 0
+    latency = {"method": "GET", "route": "/api/v1/users/events", "status": "200"}
+    assert REGISTRY.get_sample_value("botofarm_http_request_duration_seconds_count", latency) is None
+
+
+@pytest.mark.asyncio
+async def test_pool_stats(
+    client: AsyncClient,
+    prepare_database,
+) -> None:
+    """
+    GET /api/v1/users/stats считает free/locked/expired по группам.
+    """
+    _stats_cache.clear()
+    project_id = str(uuid.uuid4())
+    for i in range(3):
+        payload = {
+            "login": f"stats_{i}@example.com",
+            "password": "secret123",
+            "project_id": project_id,
+            "env": "prod",
+            "domain": "canary" if i == 0 else "regular",
+        }
+        assert (await client.post("/api/v1/users/", json=payload)).status_code == 201
+
+    resp_claim = await client.post(
+        "/api/v1/users/claim",
+        params={"count": 2, "project_id": project_id, "domain": "regular"},
+    )
+    assert len(resp_claim.json()) == 2
+
+    # одну аренду «состариваем»
+    async with AsyncSessionLocalTest() as db:
+        user = await db.get(User, UUID(resp_claim.json()[0]["id"]))
+        user.expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+        await db.commit()
+
+    resp = await client.get("/api/v1/users/stats", params={"project_id": project_id})
+    assert resp.status_code == 200
+
+    groups = {g["domain"]: g for g in resp.json()}
+    assert groups["canary"]["free"] == 1
+    assert groups["canary"]["total"] == 1
+    assert groups["regular"]["locked"] == 1
+    assert groups["regular"]["expired"] == 1
+    assert groups["regular"]["free"] == 0
+    assert groups["regular"]["total"] == 2
+
+
+@pytest.mark.asyncio
+async def test_pool_stats_buckets_add_up(
+    client: AsyncClient,
+    prepare_database,
+) -> None:
+    """
+    free + locked + expired = total для любых состояний строки,
+    включая lock без expires_at: он занят и в stats, и в списке locked=true.
+    """
+    _stats_cache.clear()
+    project_id = str(uuid.uuid4())
+    ids = []
+    for i in range(4):
+        payload = {
+            "login": f"buckets_{i}@example.com",
+            "password": "secret123",
+            "project_id": project_id,
+            "env": "prod",
+            "domain": "regular",
+        }
+        ids.append(UUID((await client.post("/api/v1/users/", json=payload)).json()["id"]))
+
+    now = datetime.now(timezone.utc)
+    async with AsyncSessionLocalTest() as db:
+        held = await db.get(User, ids[0])
+        held.locktime = now
+        held.expires_at = now + timedelta(minutes=10)
+        expired = await db.get(User, ids[1])
+        expired.locktime = now - timedelta(minutes=10)
+        expired.expires_at = now - timedelta(minutes=1)
+        # lock без аренды (как до появления expires_at)
+        legacy = await db.get(User, ids[2])
+        legacy.locktime = now
+        await db.commit()
+
+    [group] = (await client.get("/api/v1/users/stats", params={"project_id": project_id})).json()
+    assert (group["free"], group["locked"], group["expired"]) == (1, 2, 1)
+    assert group["free"] + group["locked"] + group["expired"] == group["total"] == 4
+
+    resp_locked = await client.get(
+        "/api/v1/users/", params={"project_id": project_id, "locked": True}
+    )
+    assert sorted(u["id"] for u in resp_locked.json()) == sorted([str(ids[0]), str(ids[2])])
+
+
+@pytest.mark.asyncio
+async def test_bulk_acquire_and_release(
+    client: AsyncClient,
+    prepare_database,
+) -> None:
+    """
+    Проверяем массовые POST /users/acquire и /users/release:
+    - статус по каждому id (locked / already_locked / not_found, released / conflict / not_locked)
+    - teardown по фильтру одним запросом
+    """
+    project_id = str(uuid.uuid4())
+    ids = []
+    for i in range(4):
+        payload = {
+            "login": f"bulk_lock_{i}@example.com",
+            "password": "secret123",
+            "project_id": project_id,
+            "env": "prod",
+            "domain": "regular",
+        }
+        ids.append((await client.post("/api/v1/users/", json=payload)).json()["id"])
+
+    assert (await client.post(f"/api/v1/users/{ids[0]}/acquire")).status_code == 200
+    missing = str(uuid.uuid4())
+
+    resp = await client.post("/api/v1/users/acquire", json=[ids[0], ids[1], ids[2], missing])
+    assert resp.status_code == 200
+    outcomes = resp.json()
+    assert [o["status"] for o in outcomes] == ["already_locked", "locked", "locked", "not_found"]
+    lease_token = outcomes[1]["lease_token"]
+    assert lease_token is not None and outcomes[2]["lease_token"] == lease_token
+
+    resp = await client.post(
+        "/api/v1/users/release",
+        json=[ids[0], ids[1], ids[3], missing],
+        params={"lease_token": lease_token},
+    )
+    assert [o["status"] for o in resp.json()] == ["conflict", "released", "not_locked", "not_found"]
+
+    # teardown по фильтру снимает и чужие аренды — только явным force
+    resp = await client.post(
+        "/api/v1/users/release", params={"project_id": project_id, "force": True}
+    )
+    assert sorted(o["id"] for o in resp.json()) == sorted([ids[0], ids[2]])
+    assert all(o["status"] == "released" for o in resp.json())
+
+    resp_locked = await client.get("/api/v1/users/", params={"locked": True})
+    assert resp_locked.json() == []
+
+    assert (await client.post("/api/v1/users/release", params={"force": True})).status_code == 400
+    assert (await client.post("/api/v1/users/acquire", json=[])).status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_concurrent_acquire_single_winner(
+    client: AsyncClient,
+    prepare_database,
+) -> None:
+    """
+    Конкурентные acquire одного пользователя: условный UPDATE пропускает
+    ровно одного, остальные получают 409; release держателя — тоже один раз.
+    """
+    payload = {
+        "login": f"race_{uuid.uuid4().hex[:6]}@example.com",
+        "password": "secret123",
+        "project_id": str(uuid.uuid4()),
+        "env": "prod",
+        "domain": "regular",
+    }
+    user_id = (await client.post("/api/v1/users/", json=payload)).json()["id"]
+
+    responses = await asyncio.gather(
+        *(client.post(f"/api/v1/users/{user_id}/acquire") for _ in range(10))
+    )
+    statuses = sorted(r.status_code for r in responses)
+    assert statuses == [200] + [409] * 9
+
+    [winner] = [r.json() for r in responses if r.status_code == 200]
+    releases = await asyncio.gather(
+        *(
+            client.post(
+                f"/api/v1/users/{user_id}/release",
+                params={"lease_token": winner["lease_token"]},
+            )
+            for _ in range(5)
+        )
+    )
+    messages = sorted(r.json()["message"] for r in releases)
+    assert messages == ["User successfully unlocked."] + ["User was not locked."] * 4
+
+    missing = uuid.uuid4()
+    assert (await client.post(f"/api/v1/users/{missing}/acquire")).status_code == 404
+    resp_release_missing = await client.post(
+        f"/api/v1/users/{missing}/release", params={"lease_token": str(uuid.uuid4())}
+    )
+    assert resp_release_missing.status_code == 404